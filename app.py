@@ -1,89 +1,94 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import base64
+import functools
 import gzip
 import json
 import os
-import sqlite3
-import sys
+import threading
+from collections import OrderedDict
+from time import monotonic
 
 import dash
 import dash_cytoscape as cyto
 import numpy as np
-import pandas as pd
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from flask import Flask
 
+import draw
+import export
+import metrics
+import rwalker
+import storage
+from compute import ComputePool
 from layout import run_standalone_app
+from storage import DATA_DIR
 
 # configure dash app
 server = Flask(__name__)
 app = dash.Dash(__name__, server)
+server.register_blueprint(export.blueprint)
+metrics.install(server)
 app.title = "rwalk"
 app_title = "Random Walk"
 repo_url = "https://github.com/andros21/rwalk"
 
+# custom runs: max limit and steps, background compute pool
+CUSTOM_LIMIT = 2000
+CUSTOM_NSTEPS = 1000
+POOL = ComputePool()
 
-# data dirs
-if os.path.exists("/data"):
-    DATA_DIR = "/data"
-    SQLITE3_DB = os.path.join(DATA_DIR, "rwalker.sqlite3")
-else:
-    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-    SQLITE3_DB = os.path.join(DATA_DIR, "rwalker.sqlite3")
-
-# datasets
-DATASETS = {
-    "classic": {
-        "discrete": {
-            "line": {
-                "table": "crw_line",
-            },
-            "ring": {
-                "table": "crw_ring",
-            },
-        },
-        "continuous": {
-            "line": {
-                "table": "crw_line_ct",
-            },
-            "ring": {
-                "table": "crw_ring_ct",
-            },
-            "rand": {
-                "table": "crw_rand_ct",
-            },
-        },
-    },
-    "quantum": {
-        "discrete": {
-            "line": {
-                "table": "qrw_line",
-            },
-            "ring": {
-                "table": "qrw_ring",
-            },
-        },
-        "continuous": {
-            "line": {
-                "table": "qrw_line_ct",
-            },
-            "ring": {
-                "table": "qrw_ring_ct",
-            },
-            "rand": {
-                "table": "qrw_rand_ct",
-            },
-        },
-    },
+# datasets parts memory cap in bytes, least recently used are dropped
+DATASETS_MEMORY = int(os.environ.get("RWALK_DATASETS_MEMORY", 256 * 2**20))
+
+# seconds before a dataset run is checked again against manifest index
+DATASETS_REFRESH = 5
+
+# precomputed steps slider: ticks of server playback, min, max, step
+# when no run is selected
+SLIDER_TICKS = 10
+STEPS = (10, 100, 10)
+
+# figures cache size, json-ready pdf figures and std traces
+FIGURES_CACHE = 512
+
+# plot transport: y values precision (float64, float32 or float16), plot
+# width in pixels until browser reports it, one min/max bucket per pixel
+PLOT_PRECISION = os.environ.get("RWALK_PLOT_PRECISION", "float32")
+PLOT_WIDTH = 1200
+
+# graph draw: max nodes drawn before coarsening into clusters
+DRAW_NODES = int(os.environ.get("RWALK_DRAW_NODES", 500))
+
+# play mode: frames per chunk, milliseconds per frame
+PLAY_CHUNK = 50
+PLAY_FRAME = 100
+
+
+# walkers colors by walker and time, or by walker, time and graph
+COLORS = {
+    ("classic", "discrete"): "#119DFF",
+    ("classic", "continuous"): "#0860C4",
+    ("quantum", "discrete"): "#FFCE19",
+    ("quantum", "continuous"): "#D50000",
+    ("quantum", "continuous", "line"): "#FF7700",
 }
 
-# load data from sqlite3 db
-def _get_cytoscape_json(walker, time, graph):
-    """return cytoscape json from file"""
+
+def _color(walker, time, graph):
+    """return walker color"""
+    return COLORS.get((walker, time, graph), COLORS.get((walker, time), "#990099"))
+
+
+# load data from storage backend
+def _get_cytoscape_json(draw):
+    """return cytoscape json from file, no elements if not drawn"""
+    if draw is None:
+        return list()
     with gzip.open(
-        os.path.join(DATA_DIR, f"{walker}-{graph}-{time}.json.gz"),
+        os.path.join(DATA_DIR, draw),
         "rt",
         encoding="UTF-8",
     ) as gz:
@@ -94,36 +99,465 @@ def _get_cytoscape_json(walker, time, graph):
     return elem
 
 
-colors = iter(
-    [
-        "#119DFF",  # classic dt line
-        "#119DFF",  # classic dt ring
-        "#0860C4",  # classic ct line
-        "#0860C4",  # classic ct ring
-        "#0860C4",  # classic ct rand
-        "#FFCE19",  # quantum dt line
-        "#FFCE19",  # quantum dt ring
-        "#FF7700",  # quantum ct line
-        "#D50000",  # quantum ct ring
-        "#D50000",  # quantum ct rand
-    ]
+class _Registry:
+    """
+    lru of loaded datasets parts (pdf, std tables and graph elements),
+    least recently used parts are dropped above memory cap in bytes and
+    loaded again on next access
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.nbytes = 0
+        self.lock = threading.RLock()
+        self._parts = OrderedDict()
+
+    def touch(self, owner, part):
+        """mark part of owner as most recently used"""
+        with self.lock:
+            self._parts.move_to_end((id(owner), part))
+
+    def add(self, owner, part, value):
+        """track part of owner, evicting least recently used ones"""
+        if isinstance(value, np.ndarray):
+            nbytes = value.nbytes
+        else:
+            nbytes = len(json.dumps(value))
+        with self.lock:
+            self._parts[(id(owner), part)] = (owner, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.cap and len(self._parts) > 1:
+                (_, old_part), (old, old_nbytes) = self._parts.popitem(last=False)
+                dict.pop(old, old_part, None)
+                self.nbytes -= old_nbytes
+
+    def drop(self, owner):
+        """stop tracking parts of owner"""
+        with self.lock:
+            for key in [key for key in self._parts if key[0] == id(owner)]:
+                _, nbytes = self._parts.pop(key)
+                self.nbytes -= nbytes
+
+    def stats(self):
+        """return loaded parts and their bytes"""
+        with self.lock:
+            return dict(parts=len(self._parts), nbytes=self.nbytes, cap=self.cap)
+
+
+REGISTRY = _Registry(DATASETS_MEMORY)
+DATASETS_LOADS = metrics.Counter(
+    "rwalk_datasets_parts_total", "datasets parts accesses", labels=("result",)
+)
+metrics.Gauge(
+    "rwalk_datasets_bytes",
+    "loaded datasets parts memory footprint",
+    fn=lambda: {(): REGISTRY.stats()["nbytes"]},
 )
-engine = sqlite3.connect(SQLITE3_DB)
-for walker in DATASETS:
-    for time in DATASETS[walker]:
-        for graph in DATASETS[walker][time]:
-            DATASETS[walker][time][graph]["color"] = next(colors)
-            DATASETS[walker][time][graph]["elem"] = _get_cytoscape_json(
-                walker, time, graph
+metrics.Gauge(
+    "rwalk_datasets_parts",
+    "loaded datasets parts",
+    fn=lambda: {(): REGISTRY.stats()["parts"]},
+)
+
+
+class _Lazy(dict):
+    """
+    dataset dict whose lazy parts are loaded by load(part) on first access
+    and tracked by registry, npy tables are read-only memory maps so
+    gunicorn workers share the same page cache pages
+    """
+
+    def __init__(self, load, parts, **static):
+        super().__init__(**static)
+        self.load = load
+        self.parts = parts
+
+    def __getitem__(self, part):
+        if part not in self.parts:
+            return super().__getitem__(part)
+        with REGISTRY.lock:
+            if part in self:
+                REGISTRY.touch(self, part)
+                DATASETS_LOADS.inc("hit")
+                return super().__getitem__(part)
+        DATASETS_LOADS.inc("miss")
+        with metrics.DATASET_LOAD_SECONDS.time(part):
+            value = self.load(part)
+        with REGISTRY.lock:
+            if part not in self:
+                self[part] = value
+                REGISTRY.add(self, part, value)
+            return super().__getitem__(part)
+
+
+def _dataset(run):
+    """
+    return lazy dataset of manifest index run: graph elements, client
+    side playback payload and tables
+    """
+    tabs = {table[len(run["name"]) + 1 :]: table for table in run["tables"]}
+    return _Lazy(
+        lambda part: (
+            _get_cytoscape_json(run["draw"])
+            if part == "elem"
+            else _playback_data(run["name"])
+        ),
+        ["elem", "playback"],
+        run=run,
+        table=run["name"],
+        graph=run["graph"],
+        color=_color(run["walker"], run["time"], run["graph"]),
+        dataframe=_Lazy(
+            lambda tab: storage.load(tabs[tab], storage=run["storage"]), list(tabs)
+        ),
+    )
+
+
+class _Datasets(dict):
+    """
+    datasets by run name, looked up in manifest index on first access
+    and checked again every DATASETS_REFRESH seconds, a run registered
+    again (extended or rerun) with another checksum is reloaded and
+    figures caches are cleared
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._checked = dict()
+
+    def __getitem__(self, name):
+        now = monotonic()
+        if name in self and now - self._checked[name] < DATASETS_REFRESH:
+            return super().__getitem__(name)
+        found = storage.runs(name=name)
+        old = self.get(name)
+        if not found:
+            self.pop(name, None)
+            raise KeyError(name)
+        self._checked[name] = now
+        if old is None or not old["run"]["checksum"] == found[0]["checksum"]:
+            if old is not None:
+                REGISTRY.drop(old)
+                REGISTRY.drop(old["dataframe"])
+                _clear_figures()
+            self[name] = _dataset(found[0])
+        return super().__getitem__(name)
+
+
+DATASETS = _Datasets()
+
+
+def _runs(walker, time, graph, max_nsites=None):
+    """return runs of selection, untagged ones first"""
+    found = storage.runs(max_nsites, walker=walker, time=time, graph=graph)
+    return sorted(found, key=lambda run: not run["tag"] == "")
+
+
+def _std_overlay():
+    """return untagged runs names with std table, overlaid in std plot"""
+    return [
+        run["name"]
+        for run in storage.runs(tag="")
+        if f"{run['name']}_std" in run["tables"]
+    ]
+
+
+def _sites(pdf, graph):
+    """
+    return sites coordinates of pdf columns, centered on origin for
+    line graph, sites indices for other graphs
+    """
+    if graph == "line":
+        limit = int((pdf.shape[1] - 1) * 0.5)
+        return np.arange(-limit, limit + 1, 1)
+    return np.arange(0, pdf.shape[1], 1)
+
+
+def _slider_steps(nsteps):
+    """return steps slider min, max and step of a run with nsteps steps"""
+    tick = max(nsteps // SLIDER_TICKS, 1)
+    return tick, nsteps, tick
+
+
+def _typed_array(arr):
+    """return array as float32 base64 typed array: dtype, shape and bdata"""
+    arr = np.ascontiguousarray(arr, dtype=np.float32)
+    return dict(
+        dtype="float32",
+        shape=list(arr.shape),
+        bdata=base64.b64encode(arr.data).decode(),
+    )
+
+
+def _plot_view(view):
+    """return hashable plot view: width rounded up to 100 pixels, x range"""
+    view = view or dict()
+    width = min(max(int(view.get("width") or PLOT_WIDTH), 1), 4 * PLOT_WIDTH)
+    width = -(-width // 100) * 100
+    xrange = view.get("range")
+    if xrange is not None:
+        xrange = (float(xrange[0]), float(xrange[1]))
+    return width, xrange
+
+
+def _reduction(size, width):
+    """
+    return plot width downsampling size points, None if they are sent as
+    they are, so figures cache keys don't depend on width of small plots
+    """
+    return width if size > 2 * width else None
+
+
+def _reduce(x, y, width, xrange=None):
+    """
+    return plot points x, y as json-ready lists:
+        1. only points inside x range, plus one on each side
+        2. downsampled keeping min and max of one bucket per pixel,
+           unless width is None
+        3. y quantized to PLOT_PRECISION significant digits
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if xrange is not None:
+        start, stop = np.searchsorted(x, xrange)
+        x, y = x[max(start - 1, 0) : stop + 1], y[max(start - 1, 0) : stop + 1]
+    if width is not None and x.size > 2 * width:
+        k = -(-x.size // width)
+        idx = np.minimum(np.arange(width * k).reshape(width, k), x.size - 1)
+        rows = np.arange(width)
+        keep = np.unique(
+            np.concatenate(
+                [
+                    idx[rows, y[idx].argmin(axis=1)],
+                    idx[rows, y[idx].argmax(axis=1)],
+                    [0, x.size - 1],
+                ]
             )
-            DATASETS[walker][time][graph]["dataframe"] = dict()
-            tabs = ["pdf", "std"] if not graph == "rand" else ["pdf"]
-            for tab in tabs:
-                DATASETS[walker][time][graph]["dataframe"][tab] = pd.read_sql(
-                    f"select * from {DATASETS[walker][time][graph]['table']}_{tab}",
-                    engine,
-                )
-engine.close()
+        )
+        x, y = x[keep], y[keep]
+    if not PLOT_PRECISION == "float64":
+        digits = np.finfo(PLOT_PRECISION).precision
+        y = np.char.mod(f"%.{digits}g", y).astype(float)
+    return x.tolist(), y.tolist()
+
+
+def _pdf_figure(pdf, graph, step, col, view=(PLOT_WIDTH, None)):
+    """
+    return json-ready density function figure of step inside plot view,
+    steps past the last one show the last one
+    """
+    step = min(step, pdf.shape[0] - 1)
+    x, y = _reduce(_sites(pdf, graph), pdf[step], *view)
+    return {
+        "data": [
+            dict(
+                type="scatter",
+                fill="tozeroy",
+                x=x,
+                y=y,
+                marker={
+                    "color": col,
+                },
+            )
+        ],
+        "layout": dict(
+            xaxis={"title": "sites"},
+            yaxis={"title": "pdf"},
+            uirevision=graph,
+        ),
+    }
+
+
+def _pdf_frames(pdf, graph, start, stop, view=(PLOT_WIDTH, None)):
+    """return json-ready animation frames of steps from start to stop"""
+    sites = _sites(pdf, graph)
+    block = np.asarray(pdf[start:stop])
+    frames = list()
+    for step, row in enumerate(block, start):
+        x, y = _reduce(sites, row, *view)
+        frames.append(dict(name=str(step), data=[dict(x=x, y=y)], traces=[0]))
+    return frames
+
+
+@functools.lru_cache(maxsize=FIGURES_CACHE)
+def _dataset_pdf_figure(name, step, width):
+    """return cached density function figure of dataset step, whole x range"""
+    dataset = DATASETS[name]
+    return _pdf_figure(
+        dataset["dataframe"]["pdf"],
+        dataset["graph"],
+        step,
+        dataset["color"],
+        (width, None),
+    )
+
+
+def _dataset_pdf(name, step, view):
+    """
+    return density function figure of dataset step inside plot view,
+    cached by step and reduction unless zoomed in an x range
+    """
+    dataset = DATASETS[name]
+    step = min(step, dataset["run"]["nsteps"])
+    width, xrange = view
+    if xrange is not None:
+        return _pdf_figure(
+            dataset["dataframe"]["pdf"], dataset["graph"], step, dataset["color"], view
+        )
+    return _dataset_pdf_figure(name, step, _reduction(dataset["run"]["nsites"], width))
+
+
+@functools.lru_cache(maxsize=FIGURES_CACHE)
+def _dataset_std_trace(name, step, width):
+    """return cached standard deviation trace of dataset up to step"""
+    dataset = DATASETS[name]
+    std = dataset["dataframe"]["std"]
+    x, y = _reduce(np.arange(0, step + 1, 1), std.reshape(-1)[: step + 1], width)
+    return dict(
+        type="scatter",
+        x=x,
+        y=y,
+        name=name,
+        marker={
+            "color": dataset["color"],
+        },
+    )
+
+
+def _dataset_std(name, step, width):
+    """return standard deviation trace of dataset up to step, cached by reduction"""
+    step = min(step, DATASETS[name]["run"]["nsteps"])
+    return _dataset_std_trace(name, step, _reduction(step + 1, width))
+
+
+def _std_names(name):
+    """return datasets names of std plot: overlay plus name if it has std"""
+    names = _std_overlay()
+    if (
+        name is not None
+        and name not in names
+        and "std" in DATASETS[name]["dataframe"].parts
+    ):
+        names.append(name)
+    return names
+
+
+def _playback_data(name):
+    """
+    return whole dataset for client side playback: sites, color,
+    pdf matrix and std traces as float32 base64 typed arrays, loaded
+    as playback part of dataset to be bounded by datasets memory cap
+    """
+    dataset = DATASETS[name]
+    pdf = dataset["dataframe"]["pdf"]
+    std = [
+        dict(
+            name=nm,
+            color=DATASETS[nm]["color"],
+            y=_typed_array(DATASETS[nm]["dataframe"]["std"].reshape(-1)),
+        )
+        for nm in _std_names(name)
+    ]
+    return dict(
+        key=name,
+        sites=_sites(pdf, dataset["graph"]).tolist(),
+        color=dataset["color"],
+        pdf=_typed_array(pdf),
+        std=std,
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _draw_graph(name, layout):
+    """return cached graph draw: nodes positions, edges and names"""
+    elem = DATASETS[name]["elem"]
+    nodes = [el["data"] for el in elem if "source" not in el["data"]]
+    edges = np.array(
+        [
+            (int(el["data"]["source"]), int(el["data"]["target"]))
+            for el in elem
+            if "source" in el["data"]
+        ],
+        dtype=int,
+    ).reshape(-1, 2)
+    names = [node["name"] for node in nodes]
+    return draw.positions(len(nodes), layout), edges, names
+
+
+@functools.lru_cache(maxsize=FIGURES_CACHE)
+def _draw_lod(name, layout, box):
+    """return cached graph draw nodes groups and elements inside lod box"""
+    pos, edges, names = _draw_graph(name, layout)
+    return draw.coarsen(pos, edges, names, box, DRAW_NODES)
+
+
+def _clear_figures():
+    """clear figures and graph draws caches"""
+    for cache in (_dataset_pdf_figure, _dataset_std_trace, _draw_graph, _draw_lod):
+        cache.cache_clear()
+
+
+def _caches_info():
+    """return lru caches hits and misses by cache and result"""
+    info = dict()
+    for cache in (
+        _dataset_pdf_figure,
+        _dataset_std_trace,
+        _draw_graph,
+        _draw_lod,
+    ):
+        stats = cache.cache_info()
+        info[(cache.__name__, "hit")] = stats.hits
+        info[(cache.__name__, "miss")] = stats.misses
+    return info
+
+
+metrics.Counter(
+    "rwalk_cache_requests_total",
+    "figures lru caches lookups",
+    labels=("cache", "result"),
+    fn=_caches_info,
+)
+
+
+def _warm_figures():
+    """fill figures cache with every precomputed slider step of untagged runs"""
+    view = _plot_view(None)
+    overlay = _std_overlay()
+    for run in storage.runs(tag=""):
+        start, stop, tick = _slider_steps(run["nsteps"])
+        for step in range(start, stop + 1, tick):
+            for name in overlay:
+                _dataset_std(name, step, view[0])
+            _dataset_pdf(run["name"], step, view)
+
+
+def _prefetch():
+    """load default selection, mark app ready, then warm figures cache"""
+    for run in _runs("classic", "discrete", "line")[:1]:
+        dataset = DATASETS[run["name"]]
+        dataset["elem"]
+        for tab in dataset["dataframe"].parts:
+            dataset["dataframe"][tab]
+        _dataset_pdf(run["name"], 50, _plot_view(None))
+    READY.set()
+    _warm_figures()
+
+
+READY = threading.Event()
+threading.Thread(target=_prefetch, name="prefetch", daemon=True).start()
+
+
+@server.route("/healthz")
+def healthz():
+    """liveness: process is serving requests"""
+    return {"status": "ok"}
+
+
+@server.route("/readyz")
+def readyz():
+    """readiness: default selection loaded, with datasets memory stats"""
+    stats = dict(REGISTRY.stats(), ready=READY.is_set())
+    return stats, 200 if READY.is_set() else 503
 
 
 def description():
@@ -149,9 +583,12 @@ def layout():
                         children=[
                             html.Div(
                                 id="vp-graph-div",
-                                children=dcc.Graph(
-                                    id="vp-graph",
-                                ),
+                                children=[
+                                    dcc.Graph(
+                                        id="vp-graph",
+                                    ),
+                                    dcc.Store(id="vp-graph-view"),
+                                ],
                             ),
                         ],
                     ),
@@ -173,10 +610,16 @@ def layout():
                         children=[
                             html.Div(
                                 id="vp-graph-draw-div",
-                                children=cyto.Cytoscape(
-                                    id="vp-graph-draw",
-                                    style={"width": "100%"},
-                                ),
+                                children=[
+                                    cyto.Cytoscape(
+                                        id="vp-graph-draw",
+                                        layout={"name": "preset"},
+                                        style={"width": "100%"},
+                                    ),
+                                    dcc.Store(id="vp-draw-lod"),
+                                    dcc.Store(id="vp-draw-key"),
+                                    dcc.Store(id="vp-draw-values"),
+                                ],
                             ),
                         ],
                     ),
@@ -235,7 +678,9 @@ def layout():
                                                             "label": walker,
                                                             "value": walker,
                                                         }
-                                                        for walker in DATASETS
+                                                        for walker in storage.distinct(
+                                                            "walker"
+                                                        )
                                                     ],
                                                     value="classic",
                                                 ),
@@ -250,7 +695,9 @@ def layout():
                                                             "label": time,
                                                             "value": time,
                                                         }
-                                                        for time in DATASETS["classic"]
+                                                        for time in storage.distinct(
+                                                            "time"
+                                                        )
                                                     ],
                                                     value="discrete",
                                                 ),
@@ -265,12 +712,31 @@ def layout():
                                                             "label": graph,
                                                             "value": graph,
                                                         }
-                                                        for graph in DATASETS[
-                                                            "classic"
-                                                        ]["continuous"]
+                                                        for graph in storage.distinct(
+                                                            "graph"
+                                                        )
                                                     ],
                                                     value="line",
                                                 ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Max sites",
+                                                ),
+                                                dcc.Input(
+                                                    id="vp-dataset-max-sites",
+                                                    type="number",
+                                                    min=1,
+                                                    step=1,
+                                                    placeholder="any",
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Run",
+                                                ),
+                                                dcc.Dropdown(
+                                                    id="vp-dataset-run",
+                                                    clearable=False,
+                                                ),
                                                 html.Div(
                                                     className="app-controls-name",
                                                     children="Draw",
@@ -289,17 +755,161 @@ def layout():
                                                     ],
                                                     value="grid",
                                                 ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Draw color",
+                                                ),
+                                                dcc.RadioItems(
+                                                    id="vp-draw-color-radio",
+                                                    options=[
+                                                        {
+                                                            "label": color,
+                                                            "value": color,
+                                                        }
+                                                        for color in [
+                                                            "walker",
+                                                            "pdf",
+                                                        ]
+                                                    ],
+                                                    value="walker",
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Mode",
+                                                ),
+                                                dcc.RadioItems(
+                                                    id="vp-mode-radio",
+                                                    options=[
+                                                        {
+                                                            "label": mode,
+                                                            "value": mode,
+                                                        }
+                                                        for mode in [
+                                                            "precomputed",
+                                                            "custom",
+                                                        ]
+                                                    ],
+                                                    value="precomputed",
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Playback",
+                                                ),
+                                                dcc.RadioItems(
+                                                    id="vp-playback-radio",
+                                                    options=[
+                                                        {
+                                                            "label": playback,
+                                                            "value": playback,
+                                                        }
+                                                        for playback in [
+                                                            "server",
+                                                            "client",
+                                                        ]
+                                                    ],
+                                                    value="server",
+                                                ),
                                                 html.Div(
                                                     className="app-controls-name",
                                                     children="Steps",
                                                 ),
                                                 dcc.Slider(
-                                                    10,
-                                                    100,
-                                                    10,
+                                                    *STEPS,
                                                     value=50,
                                                     id="vp-dataset-slider",
                                                 ),
+                                                html.Button(
+                                                    "Play",
+                                                    id="vp-play-button",
+                                                    n_clicks=0,
+                                                ),
+                                                html.Div(id="vp-play-status"),
+                                                dcc.Store(id="vp-play"),
+                                                dcc.Store(id="vp-play-frames"),
+                                                dcc.Interval(
+                                                    id="vp-play-tick",
+                                                    interval=PLAY_CHUNK
+                                                    * PLAY_FRAME
+                                                    // 2,
+                                                    disabled=True,
+                                                ),
+                                                dcc.Store(id="vp-playback-data"),
+                                                dcc.Store(id="vp-server-step", data=50),
+                                            ],
+                                        )
+                                    ],
+                                ),
+                            ),
+                            dcc.Tab(
+                                label="Custom Run",
+                                value="custom",
+                                children=html.Div(
+                                    className="control-tab",
+                                    children=[
+                                        html.Div(
+                                            className="app-controls-block",
+                                            children=[
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Limit",
+                                                ),
+                                                dcc.Input(
+                                                    id="vp-custom-limit",
+                                                    type="number",
+                                                    min=1,
+                                                    max=CUSTOM_LIMIT,
+                                                    step=1,
+                                                    value=50,
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Steps",
+                                                ),
+                                                dcc.Input(
+                                                    id="vp-custom-nsteps",
+                                                    type="number",
+                                                    min=1,
+                                                    max=CUSTOM_NSTEPS,
+                                                    step=1,
+                                                    value=100,
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Gamma",
+                                                ),
+                                                dcc.Input(
+                                                    id="vp-custom-gamma",
+                                                    type="number",
+                                                    min=0,
+                                                    step=0.01,
+                                                    value=rwalker.GAMMAS["classic"],
+                                                ),
+                                                html.Div(
+                                                    className="app-controls-name",
+                                                    children="Init site",
+                                                ),
+                                                dcc.Input(
+                                                    id="vp-custom-init",
+                                                    type="number",
+                                                    step=1,
+                                                    value=0,
+                                                ),
+                                                html.Button(
+                                                    "Run",
+                                                    id="vp-custom-run",
+                                                    n_clicks=0,
+                                                ),
+                                                html.P(
+                                                    'Walker, time and graph are taken from "Plot" tab, '
+                                                    'select "custom" mode there to show the run.'
+                                                ),
+                                                html.Div(id="vp-custom-status"),
+                                                dcc.Store(id="vp-custom-job"),
+                                                dcc.Interval(
+                                                    id="vp-custom-poll",
+                                                    interval=1000,
+                                                    disabled=True,
+                                                ),
                                             ],
                                         )
                                     ],
@@ -313,71 +923,302 @@ def layout():
     )
 
 
+def _init_sites(graph, limit):
+    """return first and last init site of a custom run on graph"""
+    nsites, _ = rwalker._graph_sites(graph, limit)
+    if graph == "line":
+        return -limit, limit
+    return 0, nsites - 1
+
+
 def callbacks(_app):
     @_app.callback(
-        Output("vp-graph", "figure"),
+        [
+            Output("vp-custom-job", "data"),
+            Output("vp-custom-status", "children"),
+            Output("vp-custom-poll", "disabled"),
+        ],
+        [
+            Input("vp-custom-run", "n_clicks"),
+            Input("vp-custom-poll", "n_intervals"),
+        ],
+        [
+            State("vp-custom-job", "data"),
+            State("vp-dataset-radio", "value"),
+            State("vp-dataset-radio-time", "value"),
+            State("vp-dataset-radio-graph", "value"),
+            State("vp-custom-limit", "value"),
+            State("vp-custom-nsteps", "value"),
+            State("vp-custom-gamma", "value"),
+            State("vp-custom-init", "value"),
+        ],
+        prevent_initial_call=True,
+    )
+    def update_custom(
+        n_clicks, n_intervals, job, walker, time, graph, limit, nsteps, gamma, init
+    ):
+        """submit custom run to compute pool, then poll its status"""
+        if dash.ctx.triggered_id == "vp-custom-run":
+            if None in (limit, nsteps, gamma, init):
+                return dash.no_update, "invalid parameters", True
+            limit = min(int(limit), CUSTOM_LIMIT)
+            first, last = _init_sites(graph, limit)
+            if not first <= int(init) <= last:
+                return dash.no_update, "invalid parameters", True
+            params = dict(
+                walker=walker,
+                time=time,
+                graph=graph,
+                init_site=int(init),
+                limit=limit,
+                nsteps=min(int(nsteps), CUSTOM_NSTEPS),
+                gamma=float(gamma) if time == "continuous" else None,
+            )
+            key, status = POOL.submit(params)
+            job = dict(key=key, params=params, status=status)
+        elif job is None:
+            return dash.no_update, dash.no_update, True
+        else:
+            status = POOL.status(job["key"])
+            if status == job["status"]:
+                return dash.no_update, dash.no_update, False
+            job = dict(job, status=status)
+        if status == "rejected":
+            status = "rejected: server busy, retry later"
+        return job, f"custom run {status}", not job["status"] == "running"
+
+    @_app.callback(
+        Output("vp-custom-gamma", "value"),
+        Input("vp-dataset-radio", "value"),
+    )
+    def update_gamma(walker):
+        """reset custom run gamma to walker default"""
+        return rwalker.GAMMAS[walker]
+
+    @_app.callback(
+        [
+            Output("vp-dataset-slider", "min"),
+            Output("vp-dataset-slider", "max"),
+            Output("vp-dataset-slider", "step"),
+        ],
+        [
+            Input("vp-mode-radio", "value"),
+            Input("vp-custom-job", "data"),
+            Input("vp-playback-radio", "value"),
+            Input("vp-dataset-run", "value"),
+        ],
+    )
+    def update_slider(mode, job, playback, name):
+        """
+        fit steps slider to custom run steps, or to selected run steps,
+        every step if client side playback
+        """
+        if mode == "custom" and job is not None:
+            return 0, job["params"]["nsteps"], 1
+        steps = (
+            STEPS if name is None else _slider_steps(DATASETS[name]["run"]["nsteps"])
+        )
+        if playback == "client":
+            return steps[0], steps[1], 1
+        return steps
+
+    @_app.callback(
+        [
+            Output("vp-dataset-run", "options"),
+            Output("vp-dataset-run", "value"),
+        ],
         [
             Input("vp-dataset-radio", "value"),
             Input("vp-dataset-radio-time", "value"),
             Input("vp-dataset-radio-graph", "value"),
+            Input("vp-dataset-max-sites", "value"),
+        ],
+        State("vp-dataset-run", "value"),
+    )
+    def update_runs(walker, time, graph, max_sites, name):
+        """list manifest index runs of selection, keeping selected one"""
+        runs = _runs(walker, time, graph, max_sites)
+        options = [
+            {
+                "label": f"{run['name']} ({run['nsites']} sites, {run['nsteps']} steps)",
+                "value": run["name"],
+            }
+            for run in runs
+        ]
+        names = [run["name"] for run in runs]
+        return options, name if name in names else next(iter(names), None)
+
+    @_app.callback(
+        Output("vp-playback-data", "data"),
+        [
+            Input("vp-dataset-run", "value"),
+            Input("vp-playback-radio", "value"),
+            Input("vp-mode-radio", "value"),
+        ],
+    )
+    def update_playback(name, playback, mode):
+        """send whole dataset to browser once, if client side playback"""
+        if name is not None and playback == "client" and mode == "precomputed":
+            return DATASETS[name]["playback"]
+        return None
+
+    _app.clientside_callback(
+        ClientsideFunction(namespace="rwalk", function_name="playback"),
+        [
+            Output("vp-graph", "figure", allow_duplicate=True),
+            Output("vp-graph-std", "figure", allow_duplicate=True),
+            Output("vp-server-step", "data"),
+        ],
+        [
             Input("vp-dataset-slider", "value"),
+            Input("vp-playback-data", "data"),
         ],
+        prevent_initial_call=True,
     )
-    def update_pdf(walker, time, graph, step):
+
+    _app.clientside_callback(
+        ClientsideFunction(namespace="rwalk", function_name="viewport"),
+        Output("vp-graph-view", "data"),
+        Input("vp-graph", "relayoutData"),
+        State("vp-graph-view", "data"),
+    )
+
+    def _custom_result(job):
+        """return custom run result if done, otherwise None"""
+        if job is None or not job["status"] == "done":
+            return None
+        return POOL.result(job["key"])
+
+    @_app.callback(
+        Output("vp-graph", "figure"),
+        [
+            Input("vp-dataset-run", "value"),
+            Input("vp-server-step", "data"),
+            Input("vp-mode-radio", "value"),
+            Input("vp-custom-job", "data"),
+            Input("vp-graph-view", "data"),
+        ],
+        State("vp-playback-radio", "value"),
+    )
+    def update_pdf(name, step, mode, job, view, playback):
         """Update density function plot"""
-        col = DATASETS[walker][time][graph]["color"]
-        df = DATASETS[walker][time][graph]["dataframe"]["pdf"]
-        if graph == "line":
-            limit = int((df.columns.size - 1) * 0.5)
-            sites = np.arange(-limit, limit + 1, 1)
-        elif graph == "ring" or graph == "rand":
-            limit = df.columns.size
-            sites = np.arange(0, limit, 1)
-        else:
-            sys.exit(1)
-        return {
-            "data": [
-                dict(
-                    type="scatter",
-                    fill="tozeroy",
-                    x=sites,
-                    y=df.loc[step].to_numpy(),
-                    marker={
-                        "color": col,
-                    },
-                )
-            ],
-            "layout": dict(
-                xaxis={"title": "sites"},
-                yaxis={"title": "pdf"},
-            ),
-        }
+        if playback == "client" and mode == "precomputed":
+            return dash.no_update
+        if mode == "custom":
+            res = _custom_result(job)
+            if res is None:
+                return {"data": [], "layout": dict(title="no custom run")}
+            step = min(step, res["pdf"].shape[0] - 1)
+            return _pdf_figure(
+                res["pdf"],
+                job["params"]["graph"],
+                step,
+                _color(*(job["params"][p] for p in ("walker", "time", "graph"))),
+                _plot_view(view),
+            )
+        if name is None:
+            return {"data": [], "layout": dict(title="no run")}
+        return _dataset_pdf(name, step, _plot_view(view))
+
+    def _play_pdf(play):
+        """return pdf of play state, dataset or custom run one"""
+        if play["mode"] == "custom":
+            res = POOL.result(play["key"])
+            return None if res is None else res["pdf"]
+        return DATASETS[play["name"]]["dataframe"]["pdf"]
+
+    @_app.callback(
+        [
+            Output("vp-play", "data"),
+            Output("vp-play-frames", "data"),
+            Output("vp-play-tick", "disabled"),
+            Output("vp-play-button", "children"),
+        ],
+        [
+            Input("vp-play-button", "n_clicks"),
+            Input("vp-play-tick", "n_intervals"),
+        ],
+        [
+            State("vp-play", "data"),
+            State("vp-dataset-run", "value"),
+            State("vp-dataset-slider", "value"),
+            State("vp-mode-radio", "value"),
+            State("vp-custom-job", "data"),
+            State("vp-graph-view", "data"),
+        ],
+        prevent_initial_call=True,
+    )
+    def update_play(n_clicks, n_intervals, play, name, step, mode, job, view):
+        """stream pdf animation frames in chunks, from slider step to last one"""
+        if dash.ctx.triggered_id == "vp-play-button":
+            if play is not None:
+                return None, dict(frames=[], reset=True), True, "Play"
+            play = dict(name=name, mode=mode, view=view)
+            if mode == "custom":
+                if _custom_result(job) is None:
+                    return dash.no_update, dash.no_update, True, "Play"
+                play.update(key=job["key"], graph=job["params"]["graph"])
+            elif name is None:
+                return dash.no_update, dash.no_update, True, "Play"
+            else:
+                play.update(graph=DATASETS[name]["graph"])
+            play["next"] = step
+        elif play is None:
+            return dash.no_update, dash.no_update, True, "Play"
+        pdf = _play_pdf(play)
+        if pdf is None or play["next"] >= pdf.shape[0]:
+            return None, dash.no_update, True, "Play"
+        start, stop = play["next"], min(play["next"] + PLAY_CHUNK, pdf.shape[0])
+        frames = _pdf_frames(pdf, play["graph"], start, stop, _plot_view(play["view"]))
+        reset = dash.ctx.triggered_id == "vp-play-button"
+        chunk = dict(frames=frames, reset=reset, duration=PLAY_FRAME)
+        if stop == pdf.shape[0]:
+            return None, chunk, True, "Play"
+        return dict(play, next=stop), chunk, False, "Stop"
+
+    _app.clientside_callback(
+        ClientsideFunction(namespace="rwalk", function_name="play"),
+        Output("vp-play-status", "children"),
+        Input("vp-play-frames", "data"),
+        prevent_initial_call=True,
+    )
 
     @_app.callback(
         Output("vp-graph-std", "figure"),
-        [Input("vp-dataset-slider", "value")],
+        [
+            Input("vp-dataset-run", "value"),
+            Input("vp-server-step", "data"),
+            Input("vp-mode-radio", "value"),
+            Input("vp-custom-job", "data"),
+            Input("vp-graph-view", "data"),
+        ],
+        State("vp-playback-radio", "value"),
     )
-    def update_std(step):
+    def update_std(name, step, mode, job, view, playback):
         """Update standard deviation plot"""
+        if playback == "client" and mode == "precomputed":
+            return dash.no_update
         data = list()
-        for walker in DATASETS:
-            for time in DATASETS[walker]:
-                for graph in DATASETS[walker][time]:
-                    if not graph == "rand":
-                        col = DATASETS[walker][time][graph]["color"]
-                        df = DATASETS[walker][time][graph]["dataframe"]["std"]
-                        nm = DATASETS[walker][time][graph]["table"]
-                        data.append(
-                            dict(
-                                type="scatter",
-                                x=df.index.to_numpy()[: step + 1],
-                                y=df["0"][: step + 1],
-                                name=nm,
-                                marker={
-                                    "color": col,
-                                },
-                            )
-                        )
+        width, _ = _plot_view(view)
+        res = _custom_result(job) if mode == "custom" else None
+        if res is not None and res["std"] is not None:
+            x, y = _reduce(
+                np.arange(0, min(step, res["std"].size - 1) + 1, 1),
+                res["std"][: step + 1],
+                width,
+            )
+            data.append(
+                dict(
+                    type="scatter",
+                    x=x,
+                    y=y,
+                    name="custom",
+                    marker={
+                        "color": "#990099",
+                    },
+                )
+            )
+        data.extend(_dataset_std(nm, step, width) for nm in _std_names(name))
         return {
             "data": data,
             "layout": dict(
@@ -387,24 +1228,56 @@ def callbacks(_app):
         }
 
     @_app.callback(
-        Output("vp-graph-draw", "elements"),
         [
-            Input("vp-dataset-radio", "value"),
-            Input("vp-dataset-radio-time", "value"),
-            Input("vp-dataset-radio-graph", "value"),
+            Output("vp-draw-lod", "data"),
+            Output("vp-draw-key", "data"),
         ],
+        [
+            Input("vp-dataset-run", "value"),
+            Input("vp-dataset-radio-draw", "value"),
+            Input("vp-graph-draw", "extent"),
+        ],
+        State("vp-draw-key", "data"),
     )
-    def update_draw(walker, time, graph):
-        """update graph draw"""
-        return DATASETS[walker][time][graph]["elem"]
+    def update_draw(name, layout, extent, key):
+        """update graph draw elements at level of detail of viewport extent"""
+        if name is None:
+            return dict(key=None, elements=[]), None
+        pos, _, _ = _draw_graph(name, layout)
+        box = draw.level_of_detail(pos, extent, DRAW_NODES)
+        new_key = [name, layout, box]
+        if key is not None and json.dumps(key) == json.dumps(new_key):
+            return dash.no_update, dash.no_update
+        _, elements = _draw_lod(name, layout, box)
+        return dict(key=json.dumps(new_key), elements=elements), new_key
 
     @_app.callback(
-        Output("vp-graph-draw", "layout"),
-        Input("vp-dataset-radio-draw", "value"),
+        Output("vp-draw-values", "data"),
+        [
+            Input("vp-draw-key", "data"),
+            Input("vp-dataset-slider", "value"),
+            Input("vp-draw-color-radio", "value"),
+        ],
+    )
+    def update_draw_values(key, step, color):
+        """send pdf at step of drawn nodes, summed over clusters"""
+        if key is None or not color == "pdf":
+            return None
+        name, layout, box = key
+        box = None if box is None else tuple(box)
+        groups, _ = _draw_lod(name, layout, box)
+        pdf = DATASETS[name]["dataframe"]["pdf"]
+        step = min(step, pdf.shape[0] - 1)
+        return dict(key=json.dumps(key), pdf=draw.values(groups, pdf[step]))
+
+    _app.clientside_callback(
+        ClientsideFunction(namespace="rwalk", function_name="draw"),
+        Output("vp-graph-draw", "elements"),
+        [
+            Input("vp-draw-lod", "data"),
+            Input("vp-draw-values", "data"),
+        ],
     )
-    def update_layout(layout):
-        """update graph draw layout"""
-        return {"name": layout}
 
     @_app.callback(
         Output("vp-graph-draw", "stylesheet"),
@@ -412,23 +1285,47 @@ def callbacks(_app):
             Input("vp-dataset-radio", "value"),
             Input("vp-dataset-radio-time", "value"),
             Input("vp-dataset-radio-graph", "value"),
+            Input("vp-draw-color-radio", "value"),
         ],
     )
-    def update_stylesheet(walker, time, graph):
-        """update graph draw stylesheet"""
+    def update_stylesheet(walker, time, graph, color):
+        """update graph draw stylesheet, nodes colored by pdf if asked"""
+        col = _color(walker, time, graph)
         return [
             {
                 "selector": "node",
                 "style": {
                     "height": 20,
                     "width": 20,
-                    "background-color": DATASETS[walker][time][graph]["color"],
+                    "background-color": col,
                     "label": "data(name)",
                     "font-family": "Monospace",
                     "border-width": "1.5px",
                     "font-size": 10,
                 },
             },
+            {
+                "selector": "node.cluster",
+                "style": {
+                    "height": 30,
+                    "width": 30,
+                    "shape": "round-rectangle",
+                },
+            },
+            *(
+                [
+                    {
+                        "selector": "node",
+                        "style": {
+                            "background-color": f"mapData(pdf, 0, 1, #FFFFFF, {col})",
+                            "height": "mapData(pdf, 0, 1, 10, 40)",
+                            "width": "mapData(pdf, 0, 1, 10, 40)",
+                        },
+                    }
+                ]
+                if color == "pdf"
+                else []
+            ),
             {
                 "selector": "edge",
                 "style": {
@@ -443,14 +1340,15 @@ def callbacks(_app):
         Input("vp-dataset-radio-time", "value"),
     )
     def option_radio_graph(time):
-        """block rand graph option if time is discrete"""
+        """block graph options without runs of selected time"""
+        graphs = storage.distinct("graph", time=time)
         return [
             {
-                "disabled": True if (time == "discrete" and graph == "rand") else False,
+                "disabled": graph not in graphs,
                 "label": graph,
                 "value": graph,
             }
-            for graph in DATASETS["classic"]["continuous"]
+            for graph in storage.distinct("graph")
         ]
 
     @_app.callback(
@@ -458,18 +1356,27 @@ def callbacks(_app):
         Input("vp-dataset-radio-graph", "value"),
     )
     def option_radio_time(graph):
-        """block discrete time option if graph is random"""
+        """block time options without runs on selected graph"""
+        times = storage.distinct("time", graph=graph)
         return [
             {
-                "disabled": True if (graph == "rand" and time == "discrete") else False,
+                "disabled": time not in times,
                 "label": time,
                 "value": time,
             }
-            for time in DATASETS["classic"]
+            for time in storage.distinct("time")
         ]
 
 
-run_standalone_app(app, app_title, repo_url, layout, callbacks, header_colors, __file__)
+run_standalone_app(
+    app,
+    app_title,
+    repo_url,
+    layout,
+    metrics.instrument(callbacks),
+    header_colors,
+    __file__,
+)
 
 if __name__ == "__main__":
     app.run_server()
@@ -0,0 +1,24 @@
+/* graph draw: merge per-node pdf values of current step into elements of
+   the same level of detail, without resending elements from server */
+
+(function () {
+  window.dash_clientside = Object.assign({}, window.dash_clientside);
+  window.dash_clientside.rwalk = Object.assign({}, window.dash_clientside.rwalk, {
+    draw: function (lod, values) {
+      if (!lod) {
+        return window.dash_clientside.no_update;
+      }
+      if (!values || values.key !== lod.key) {
+        return lod.elements;
+      }
+      let k = 0;
+      return lod.elements.map((el) =>
+        el.position
+          ? Object.assign({}, el, {
+              data: Object.assign({}, el.data, { pdf: values.pdf[k++] }),
+            })
+          : el,
+      );
+    },
+  });
+})();
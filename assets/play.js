@@ -0,0 +1,27 @@
+/* play mode: queue pdf animation frames chunks on vp-graph as they arrive,
+   the first chunk interrupts running animation, an empty one stops it */
+
+(function () {
+  window.dash_clientside = Object.assign({}, window.dash_clientside);
+  window.dash_clientside.rwalk = Object.assign({}, window.dash_clientside.rwalk, {
+    play: function (chunk) {
+      const gd = document.querySelector("#vp-graph .js-plotly-plot");
+      if (!chunk || !gd) {
+        return window.dash_clientside.no_update;
+      }
+      if (!chunk.frames.length) {
+        Plotly.animate(gd, [], { mode: "immediate" });
+        return "";
+      }
+      const names = chunk.frames.map((frame) => frame.name);
+      Plotly.addFrames(gd, chunk.frames).then(() =>
+        Plotly.animate(gd, names, {
+          mode: chunk.reset ? "immediate" : "afterall",
+          frame: { duration: chunk.duration, redraw: false },
+          transition: { duration: 0 },
+        }),
+      );
+      return `steps ${names[0]}-${names[names.length - 1]}`;
+    },
+  });
+})();
@@ -0,0 +1,66 @@
+/* client side playback: draw pdf and std figures of a step from the whole
+   dataset sent once as float32 base64 typed arrays */
+
+(function () {
+  let decoded = { key: null };
+
+  function decode(arr) {
+    const bin = atob(arr.bdata);
+    const bytes = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) {
+      bytes[i] = bin.charCodeAt(i);
+    }
+    return new Float32Array(bytes.buffer);
+  }
+
+  function dataset(data) {
+    if (decoded.key !== data.key) {
+      decoded = {
+        key: data.key,
+        pdf: decode(data.pdf),
+        std: data.std.map((trace) => decode(trace.y)),
+      };
+    }
+    return decoded;
+  }
+
+  function range(stop) {
+    return Array.from({ length: stop }, (_, i) => i);
+  }
+
+  window.dash_clientside = Object.assign({}, window.dash_clientside);
+  window.dash_clientside.rwalk = Object.assign({}, window.dash_clientside.rwalk, {
+    playback: function (step, data) {
+      const no_update = window.dash_clientside.no_update;
+      if (!data) {
+        return [no_update, no_update, step];
+      }
+      const arrays = dataset(data);
+      const [nsteps, nsites] = data.pdf.shape;
+      step = Math.min(step, nsteps - 1);
+      const pdf = {
+        data: [
+          {
+            type: "scatter",
+            fill: "tozeroy",
+            x: data.sites,
+            y: arrays.pdf.subarray(step * nsites, (step + 1) * nsites),
+            marker: { color: data.color },
+          },
+        ],
+        layout: { xaxis: { title: "sites" }, yaxis: { title: "pdf" } },
+      };
+      const std = {
+        data: data.std.map((trace, i) => ({
+          type: "scatter",
+          x: range(step + 1),
+          y: arrays.std[i].subarray(0, step + 1),
+          name: trace.name,
+          marker: { color: trace.color },
+        })),
+        layout: { xaxis: { title: "steps" }, yaxis: { title: "std" } },
+      };
+      return [pdf, std, no_update];
+    },
+  });
+})();
@@ -0,0 +1,27 @@
+/* plot viewport: pdf graph width in pixels and zoomed x range, sent to
+   server to downsample pdf and std figures or fetch visible sites */
+
+(function () {
+  window.dash_clientside = Object.assign({}, window.dash_clientside);
+  window.dash_clientside.rwalk = Object.assign({}, window.dash_clientside.rwalk, {
+    viewport: function (relayout, view) {
+      const graph = document.getElementById("vp-graph");
+      const width = graph && graph.offsetWidth ? graph.offsetWidth : null;
+      let range = view ? view.range : null;
+      if (relayout) {
+        if ("xaxis.range[0]" in relayout) {
+          range = [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]];
+        } else if ("xaxis.range" in relayout) {
+          range = relayout["xaxis.range"];
+        } else if (relayout["xaxis.autorange"]) {
+          range = null;
+        }
+      }
+      const next = { width: width, range: range };
+      if (view && JSON.stringify(view) === JSON.stringify(next)) {
+        return window.dash_clientside.no_update;
+      }
+      return next;
+    },
+  });
+})();
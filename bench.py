@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+import scipy
+
+import rwalker
+import storage
+from storage import DATA_DIR
+
+# default baseline file and sweeps
+BENCH_JSON = os.path.join(DATA_DIR, "bench.json")
+BENCH_LIMITS = [50, 200, 800]
+BENCH_NSTEPS = [100, 1000]
+BENCH_REPEAT = 3
+
+# relative slowdown flagged as regression by compare
+BENCH_TOLERANCE = 0.25
+
+# max abs difference between pdfs of engines implementations
+AGREEMENT_TOL = 1e-8
+
+
+def _die(msg: str):
+    """print error and exit 1"""
+    print(msg, file=sys.stderr)
+    sys.exit(1)
+
+
+def _measure(run, repeat: int) -> dict:
+    """
+    return wall times of repeat runs and peak traced memory of one
+    more run, traced apart since tracemalloc slows down allocations
+    """
+    walls = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(
+        wall=statistics.median(walls), wall_min=min(walls), repeat=repeat, peak=peak
+    )
+
+
+def _engines_cases(graph: str, limits: list, nsteps: list):
+    """yield (case, params, run) of engines and laplacian sweeps"""
+    engines = {
+        "classic_dtime": rwalker.classic_dtime_evolve,
+        "classic_ctime": rwalker.classic_ctime_evolve,
+        "quantum_dtime": rwalker.quantum_dtime_evolve,
+        "quantum_ctime": rwalker.quantum_ctime_evolve,
+    }
+    for limit in limits:
+        nsites, _ = rwalker._graph_sites(graph, limit)
+        for sparse in (False, True):
+            case = "_gen_laplacian_matrix" + ("_sparse" if sparse else "")
+            yield case, dict(graph=graph, nsites=nsites), lambda n=nsites, s=sparse: (
+                rwalker._gen_laplacian_matrix(
+                    graph, n, "classic", "continuous", False, s
+                )
+            )
+        for steps in nsteps:
+            params = dict(graph=graph, nsites=nsites, nsteps=steps)
+            for case, evolve in engines.items():
+                yield case, params, lambda f=evolve, lim=limit, n=steps: f(
+                    graph, 0, lim, n
+                )
+
+
+def _dump_cases(limits: list, nsteps: list):
+    """yield (case, params, run) of storage dump of pdf tables, in a temp dir"""
+    for limit in limits:
+        for steps in nsteps:
+            pdf = np.random.default_rng(0).random((steps + 1, limit * 2 + 1))
+            params = dict(nsites=pdf.shape[1], nsteps=steps)
+            yield "storage.dump", params, lambda a=pdf: storage.dump([a], ["bench_pdf"])
+
+
+def _app_cases():
+    """
+    yield (case, params, run) of the dash app: dataset tables load and
+    pdf, std and draw callbacks with cold figures caches, for the largest
+    untagged run of each walker and time
+    """
+    import app
+
+    for thread in threading.enumerate():
+        if thread.name == "prefetch":
+            thread.join()
+    client = app.server.test_client()
+
+    def callback(output, inputs, state=()):
+        ids = output.strip(".").split("...")
+        outputs = [dict(zip(("id", "property"), o.split("."))) for o in ids]
+        body = dict(
+            output=output,
+            outputs=outputs if len(outputs) > 1 else outputs[0],
+            inputs=[dict(id=i, property=p, value=v) for i, p, v in inputs],
+            state=[dict(id=i, property=p, value=v) for i, p, v in state],
+            changedPropIds=[],
+        )
+
+        def run():
+            for cache in (app._dataset_pdf_figure, app._dataset_std_trace):
+                cache.cache_clear()
+            app._draw_graph.cache_clear()
+            app._draw_lod.cache_clear()
+            response = client.post("/_dash-update-component", json=body)
+            if response.status_code != 200:
+                _die(f"[ERROR] {output} callback failed: {response.status_code}")
+
+        return run
+
+    mode = [
+        ("vp-mode-radio", "value", "precomputed"),
+        ("vp-custom-job", "data", None),
+        ("vp-graph-view", "data", None),
+    ]
+    playback = [("vp-playback-radio", "value", "server")]
+    for walker in ("classic", "quantum"):
+        for time_ in ("discrete", "continuous"):
+            runs = [r for r in storage.runs(walker=walker, time=time_) if not r["tag"]]
+            if not runs:
+                continue
+            found = runs[-1]
+            name = found["name"]
+            params = dict(name=name, nsites=found["nsites"], nsteps=found["nsteps"])
+            yield "app.dataset_load", params, lambda r=found: [
+                np.asarray(storage.load(table, storage=r["storage"])).sum()
+                for table in r["tables"]
+            ]
+            step = [("vp-server-step", "data", found["nsteps"] // 2)]
+            yield "app.update_pdf", params, callback(
+                "vp-graph.figure",
+                [("vp-dataset-run", "value", name)] + step + mode,
+                playback,
+            )
+            yield "app.update_std", params, callback(
+                "vp-graph-std.figure",
+                [("vp-dataset-run", "value", name)] + step + mode,
+                playback,
+            )
+            yield "app.update_draw", params, callback(
+                "..vp-draw-lod.data...vp-draw-key.data..",
+                [
+                    ("vp-dataset-run", "value", name),
+                    ("vp-dataset-radio-draw", "value", "grid"),
+                    ("vp-graph-draw", "extent", None),
+                ],
+                [("vp-draw-key", "data", None)],
+            )
+
+
+def agreement(limit: int = 100, nsteps: int = 100) -> dict:
+    """
+    return max abs difference between pdfs of engines implementations:
+        1. classic discrete-time line and ring stencils vs transition
+           matrix, on few sites so that walkers reach line ends
+        2. classic continuous-time eigh vs krylov vs propagator
+        3. quantum continuous-time eigh vs krylov
+        4. quantum discrete-time total probability vs 1
+    """
+    checks = dict()
+    for graph in ("line", "ring"):
+        pdf = rwalker.classic_dtime_evolve(graph, 0, limit // 4, nsteps)
+        A = rwalker._gen_adjacency_matrix(graph, pdf.shape[1])
+        T = rwalker._transition_matrix(A)
+        ref = np.empty_like(pdf)
+        ref[0] = pdf[0]
+        for i in range(1, nsteps + 1):
+            ref[i] = T @ ref[i - 1]
+        checks[f"classic_dtime.{graph}-stencil-matrix"] = np.abs(pdf - ref).max()
+    for walker, methods in (
+        ("classic", ("krylov", "propagator")),
+        ("quantum", ("krylov",)),
+    ):
+        evolve = getattr(rwalker, f"{walker}_ctime_evolve")
+        ref = evolve("line", 0, limit, nsteps, method="eigh")
+        for method in methods:
+            pdf = evolve("line", 0, limit, nsteps, method=method)
+            checks[f"{walker}_ctime.eigh-{method}"] = np.abs(pdf - ref).max()
+    for graph in ("line", "ring"):
+        pdf = rwalker.quantum_dtime_evolve(graph, 0, limit, nsteps)
+        checks[f"quantum_dtime.{graph}-norm"] = np.abs(pdf.sum(axis=1) - 1.0).max()
+    return {check: float(diff) for check, diff in checks.items()}
+
+
+def _scaling(results: dict) -> dict:
+    """return log-log slope of wall time vs nsites of each case and nsteps"""
+    curves = dict()
+    for result in results.values():
+        params = result["params"]
+        if "nsites" not in params or "name" in params:
+            continue
+        key = result["case"]
+        if "nsteps" in params:
+            key += f"[nsteps={params['nsteps']}]"
+        curves.setdefault(key, list()).append((params["nsites"], result["wall"]))
+    return {
+        key: float(np.polyfit(*np.log(np.array(points)).T, 1)[0])
+        for key, points in curves.items()
+        if len(points) > 1
+    }
+
+
+def run(
+    output: str = BENCH_JSON,
+    graph: str = "ring",
+    limits: list = BENCH_LIMITS,
+    nsteps: list = BENCH_NSTEPS,
+    repeat: int = BENCH_REPEAT,
+    app: bool = False,
+):
+    """
+    run the benchmark suite saving json baseline with wall time (median
+    of repeat runs), peak memory, scaling slopes and engines agreement
+    """
+    cases = list(_engines_cases(graph, limits, nsteps))
+    with tempfile.TemporaryDirectory() as tmp:
+        arrays_dir, storage.ARRAYS_DIR = storage.ARRAYS_DIR, tmp
+        try:
+            results = dict()
+            for case, params, bench in cases + list(_dump_cases(limits, nsteps)):
+                key = f"{case}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+                results[key] = dict(case=case, params=params, **_measure(bench, repeat))
+                print(
+                    f"[INFO] {key} {results[key]['wall']:.4f}s "
+                    f"{results[key]['peak'] / 2**20:.1f}MiB"
+                )
+        finally:
+            storage.ARRAYS_DIR = arrays_dir
+    if app:
+        for case, params, bench in _app_cases():
+            key = f"{case}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+            results[key] = dict(case=case, params=params, **_measure(bench, repeat))
+            print(f"[INFO] {key} {results[key]['wall']:.4f}s")
+    baseline = dict(
+        meta=dict(
+            date=datetime.datetime.now().isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            numpy=np.__version__,
+            scipy=scipy.__version__,
+            machine=platform.machine(),
+            cpus=os.cpu_count(),
+            engine=rwalker.ENGINE_VERSION,
+        ),
+        results=results,
+        scaling=_scaling(results),
+        agreement=agreement(),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="UTF-8") as f:
+        json.dump(baseline, f, indent=2)
+    print(f"[INFO] benchmark baseline saved to {output}")
+
+
+def compare(baseline: str, current: str, tolerance: float = BENCH_TOLERANCE):
+    """
+    compare current benchmark against baseline, flag wall time or peak
+    memory regressions above tolerance and engines disagreements, exit 1
+    if any is found
+    """
+    with open(baseline, "r", encoding="UTF-8") as f:
+        old = json.load(f)
+    with open(current, "r", encoding="UTF-8") as f:
+        new = json.load(f)
+    flagged = 0
+    for key, result in new["results"].items():
+        if key not in old["results"]:
+            print(f"[INFO] {key} new case")
+            continue
+        for metric in ("wall", "peak"):
+            before, after = old["results"][key][metric], result[metric]
+            ratio = after / before if before else 1.0
+            if ratio > 1.0 + tolerance:
+                flagged += 1
+                print(f"[REGRESSION] {key} {metric} {before:.4g} -> {after:.4g}")
+            else:
+                print(f"[OK] {key} {metric} x{ratio:.2f}")
+    for check, diff in new["agreement"].items():
+        if diff > AGREEMENT_TOL:
+            flagged += 1
+            print(f"[DISAGREEMENT] {check} max abs difference {diff:.3g}")
+    if flagged:
+        _die(f"[ERROR] {flagged} regressions against {baseline}")
+
+
+def _parse_args(argv: list):
+    """parse command line arguments"""
+    parser = ArgumentParser(description="random walk engines benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks saving a baseline")
+    run_parser.add_argument("--output", default=BENCH_JSON)
+    run_parser.add_argument("--graph", default="ring")
+    run_parser.add_argument("--limit", nargs="+", type=int, default=BENCH_LIMITS)
+    run_parser.add_argument("--nsteps", nargs="+", type=int, default=BENCH_NSTEPS)
+    run_parser.add_argument("--repeat", type=int, default=BENCH_REPEAT)
+    run_parser.add_argument(
+        "--app", action="store_true", help="benchmark dash app datasets and callbacks"
+    )
+    compare_parser = commands.add_parser("compare", help="compare two baselines")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    if args.command == "run":
+        run(args.output, args.graph, args.limit, args.nsteps, args.repeat, args.app)
+    else:
+        compare(args.baseline, args.current, args.tolerance)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# compute pool: simulations running at once, jobs admitted at once (shared
+# by gunicorn workers), seconds before a job is killed, results lru bytes
+COMPUTE_WORKERS = int(os.environ.get("RWALK_COMPUTE_WORKERS", 1))
+COMPUTE_PENDING = int(os.environ.get("RWALK_COMPUTE_PENDING", 4))
+COMPUTE_TIMEOUT = float(os.environ.get("RWALK_COMPUTE_TIMEOUT", 60))
+COMPUTE_CACHE = int(os.environ.get("RWALK_COMPUTE_CACHE", 64 * 2**20))
+
+# spool dir of jobs locks and results, shared by gunicorn workers
+COMPUTE_DIR = os.environ.get(
+    "RWALK_COMPUTE_DIR", os.path.join(tempfile.gettempdir(), "rwalk-compute")
+)
+
+
+def job_key(params: dict) -> str:
+    """return job key derived from simulation parameters"""
+    payload = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _run(params: dict, spool: str, key: str):
+    """run simulation in a child process and save result inside spool dir"""
+    import rwalker
+
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(err):
+            res = rwalker.simulate(**params)
+    except SystemExit:
+        with open(os.path.join(spool, f"{key}.err"), "w", encoding="UTF-8") as f:
+            f.write(err.getvalue().strip() or "simulation failed")
+        return
+    arrays = dict(pdf=res["pdf"])
+    if res["std"] is not None:
+        arrays["std"] = res["std"]
+    tmp = os.path.join(spool, f"{key}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, os.path.join(spool, f"{key}.npz"))
+
+
+class ComputePool:
+    """
+    bounded pool running simulations in background child processes:
+        1. at most workers simulations run at once, others wait in queue
+        2. at most pending jobs are admitted at once, others are rejected
+        3. jobs running longer than timeout seconds are killed
+        4. results are kept in an lru bounded by cache_bytes
+    """
+
+    def __init__(
+        self,
+        workers: int = COMPUTE_WORKERS,
+        pending: int = COMPUTE_PENDING,
+        timeout: float = COMPUTE_TIMEOUT,
+        cache_bytes: int = COMPUTE_CACHE,
+        spool: str = COMPUTE_DIR,
+    ):
+        self.pending = pending
+        self.timeout = timeout
+        self.cache_bytes = cache_bytes
+        self.spool = spool
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._results = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+        os.makedirs(spool, exist_ok=True)
+
+    def _path(self, key: str, ext: str) -> str:
+        """return spool path of job key"""
+        return os.path.join(self.spool, f"{key}.{ext}")
+
+    def _remember(self, key: str, res: dict):
+        """store result in lru, evicting least recently used ones"""
+        nbytes = sum(arr.nbytes for arr in res.values() if arr is not None)
+        with self._lock:
+            if key in self._results:
+                return
+            self._results[key] = res
+            self._nbytes += nbytes
+            while self._nbytes > self.cache_bytes and len(self._results) > 1:
+                _, old = self._results.popitem(last=False)
+                self._nbytes -= sum(
+                    arr.nbytes for arr in old.values() if arr is not None
+                )
+
+    def result(self, key: str):
+        """return job result dict (pdf, std) if done, otherwise None"""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        try:
+            with np.load(self._path(key, "npz")) as npz:
+                res = dict(pdf=npz["pdf"], std=npz["std"] if "std" in npz else None)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, res)
+        return res
+
+    def _running(self) -> list:
+        """
+        return keys of admitted jobs, dropping stale locks: started jobs
+        locks hold their start time and are stale after twice timeout,
+        queued jobs locks are empty and are stale once every admitted job
+        could have run before them
+        """
+        keys = list()
+        for name in os.listdir(self.spool):
+            if not name.endswith(".lock"):
+                continue
+            path = os.path.join(self.spool, name)
+            try:
+                with open(path, "r", encoding="UTF-8") as f:
+                    started = f.read()
+                if started:
+                    stale = time.time() - float(started) > 2 * self.timeout
+                else:
+                    age = time.time() - os.path.getmtime(path)
+                    stale = age > (self.pending + 1) * self.timeout
+                if stale:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            keys.append(name[: -len(".lock")])
+        return keys
+
+    def _prune(self):
+        """remove least recently written spool results above cache_bytes"""
+        results = list()
+        for entry in os.scandir(self.spool):
+            if entry.name.endswith((".npz", ".err")):
+                stat = entry.stat()
+                results.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(result[1] for result in results)
+        for _, result_size, path in sorted(results):
+            if size <= self.cache_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            size -= result_size
+
+    def status(self, key: str) -> str:
+        """return job status: done, running, failed: reason, or unknown"""
+        if self.result(key) is not None:
+            return "done"
+        if os.path.exists(self._path(key, "lock")):
+            return "running"
+        try:
+            with open(self._path(key, "err"), "r", encoding="UTF-8") as f:
+                return f"failed: {f.read()}"
+        except OSError:
+            return "unknown"
+
+    def submit(self, params: dict):
+        """submit a simulation, return job key and its status (or rejected)"""
+        key = job_key(params)
+        status = self.status(key)
+        if status in ("done", "running"):
+            return key, status
+        if len(self._running()) >= self.pending:
+            return key, "rejected"
+        try:
+            os.close(os.open(self._path(key, "lock"), os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return key, "running"
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key, "err"))
+        self._executor.submit(self._watch, params, key)
+        return key, "running"
+
+    def _watch(self, params: dict, key: str):
+        """run job in a child process, killing it after timeout"""
+        try:
+            with open(self._path(key, "lock"), "w", encoding="UTF-8") as f:
+                f.write(repr(time.time()))
+            proc = self._ctx.Process(target=_run, args=(params, self.spool, key))
+            proc.start()
+            proc.join(self.timeout)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+                reason = f"timeout after {self.timeout:g} s"
+            elif proc.exitcode:
+                reason = f"exit code {proc.exitcode}"
+            else:
+                reason = None
+            if reason and not os.path.exists(self._path(key, "err")):
+                with open(self._path(key, "err"), "w", encoding="UTF-8") as f:
+                    f.write(reason)
+            self._prune()
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key, "lock"))
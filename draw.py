@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+# distance in pixels between neighbouring nodes
+SPACING = 40
+
+
+def positions(n: int, layout: str) -> np.ndarray:
+    """return (n, 2) nodes positions of grid or circle layout"""
+    idx = np.arange(n)
+    if layout == "grid":
+        cols = math.ceil(math.sqrt(n))
+        return np.column_stack((idx % cols, idx // cols)) * float(SPACING)
+    if layout == "circle":
+        radius = max(n * SPACING / (2 * math.pi), SPACING)
+        angle = 2 * math.pi * idx / max(n, 1)
+        return np.column_stack((np.cos(angle), np.sin(angle))) * radius
+    raise ValueError(f"{layout} layout not planned to be implemented")
+
+
+def level_of_detail(pos: np.ndarray, extent, max_nodes: int):
+    """
+    return level of detail box (level, x0, y0, x1, y1) snapped around
+    cytoscape viewport extent, level 0 is the whole graph and each level
+    halves the box side, None if whole graph fits in max_nodes
+    """
+    if len(pos) <= max_nodes:
+        return None
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max()) or 1.0
+    level = 0
+    if extent:
+        side = max(extent["w"], extent["h"], 1e-9)
+        level = max(0, math.floor(math.log2(span / side)))
+    if not level:
+        return (0, float(lo[0]), float(lo[1]), float(lo[0] + span), float(lo[1] + span))
+    cell = span / 2**level
+    x0 = lo[0] + (math.floor((extent["x1"] - lo[0]) / cell) - 1) * cell
+    y0 = lo[1] + (math.floor((extent["y1"] - lo[1]) / cell) - 1) * cell
+    x1 = lo[0] + (math.ceil((extent["x2"] - lo[0]) / cell) + 1) * cell
+    y1 = lo[1] + (math.ceil((extent["y2"] - lo[1]) / cell) + 1) * cell
+    return (level, float(x0), float(y0), float(x1), float(y1))
+
+
+def coarsen(pos: np.ndarray, edges: np.ndarray, names: list, box, max_nodes: int):
+    """
+    return nodes groups (-1 outside box) and cytoscape elements inside box:
+        1. nodes themselves if they fit in max_nodes
+        2. otherwise one cluster node per box cell at its nodes mean
+           position, with edges between clusters of connected nodes
+    """
+    n = len(pos)
+    if box is None:
+        inside = np.ones(n, dtype=bool)
+    else:
+        _, x0, y0, x1, y1 = box
+        inside = (
+            (pos[:, 0] >= x0)
+            & (pos[:, 0] <= x1)
+            & (pos[:, 1] >= y0)
+            & (pos[:, 1] <= y1)
+        )
+    groups = np.full(n, -1)
+    if inside.sum() <= max_nodes:
+        groups[inside] = np.arange(inside.sum())
+        members = np.flatnonzero(inside)
+        nodes = [
+            {
+                "data": {"id": str(i), "name": names[i], "pdf": 0},
+                "position": {"x": float(pos[i, 0]), "y": float(pos[i, 1])},
+            }
+            for i in members
+        ]
+    else:
+        cells = max(math.floor(math.sqrt(max_nodes)), 1)
+        lo, hi = pos[inside].min(axis=0), pos[inside].max(axis=0)
+        ij = np.minimum(
+            ((pos[inside] - lo) / np.maximum(hi - lo, 1e-9) * cells).astype(int),
+            cells - 1,
+        )
+        cell_ids, groups[inside] = np.unique(
+            ij[:, 0] * cells + ij[:, 1], return_inverse=True
+        )
+        count = np.bincount(groups[inside])
+        center = np.column_stack(
+            [
+                np.bincount(groups[inside], weights=pos[inside, k]) / count
+                for k in (0, 1)
+            ]
+        )
+        nodes = [
+            {
+                "data": {"id": f"c{cell}", "name": str(size), "pdf": 0},
+                "position": {"x": float(x), "y": float(y)},
+                "classes": "cluster",
+            }
+            for cell, size, (x, y) in zip(cell_ids, count, center)
+        ]
+    ids = [node["data"]["id"] for node in nodes]
+    ends = groups[edges]
+    ends = ends[(ends >= 0).all(axis=1) & (ends[:, 0] != ends[:, 1])]
+    ends = np.unique(np.sort(ends, axis=1), axis=0)
+    edges = [{"data": {"source": ids[s], "target": ids[t]}} for s, t in ends]
+    return groups, nodes + edges
+
+
+def values(groups: np.ndarray, pdf: np.ndarray) -> list:
+    """return pdf summed over nodes groups, normalized to max, 3 digits"""
+    inside = groups >= 0
+    if not inside.any():
+        return list()
+    pdf = np.bincount(groups[inside], weights=np.asarray(pdf)[inside])
+    return np.round(pdf / (pdf.max() or 1.0), 3).tolist()
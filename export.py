@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import zlib
+
+import numpy as np
+from flask import Blueprint, Response, abort, jsonify, request
+
+import storage
+
+# rows per streamed chunk
+EXPORT_CHUNK = 1024
+
+# export formats: mimetype and file extension
+FORMATS = {
+    "npy": ("application/octet-stream", "npy"),
+    "csv": ("application/gzip", "csv.gz"),
+}
+
+blueprint = Blueprint("export", __name__, url_prefix="/api")
+
+
+def _range(arg: str, size: int) -> slice:
+    """return slice of start:stop range query argument, clipped to size"""
+    value = request.args.get(arg, ":")
+    try:
+        start, stop = (int(x) if x else None for x in value.split(":"))
+    except ValueError:
+        abort(400, description=f"{arg} range must be start:stop, not {value}")
+    start, stop, _ = slice(start, stop).indices(size)
+    return slice(start, max(start, stop))
+
+
+def _npy(arr: np.ndarray, steps: slice, sites: slice):
+    """stream npy array: header then rows chunks"""
+    shape = (steps.stop - steps.start,) + (
+        (sites.stop - sites.start,) if arr.ndim == 2 else ()
+    )
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, dict(descr=arr.dtype.str, fortran_order=False, shape=shape)
+    )
+    yield header.getvalue()
+    for start in range(steps.start, steps.stop, EXPORT_CHUNK):
+        block = arr[start : min(start + EXPORT_CHUNK, steps.stop)]
+        yield np.ascontiguousarray(block[:, sites] if arr.ndim == 2 else block).data
+
+
+def _csv(arr: np.ndarray, steps: slice, sites: slice):
+    """stream gzip csv: step column then one column per site"""
+    gz = zlib.compressobj(wbits=31)
+    cols = range(sites.start, sites.stop) if arr.ndim == 2 else ["value"]
+    yield gz.compress(f"step,{','.join(map(str, cols))}\n".encode())
+    for start in range(steps.start, steps.stop, EXPORT_CHUNK):
+        block = arr[start : min(start + EXPORT_CHUNK, steps.stop)]
+        block = block[:, sites] if arr.ndim == 2 else block[:, None]
+        rows = np.column_stack((np.arange(start, start + len(block)), block))
+        text = io.StringIO()
+        np.savetxt(text, rows, fmt=["%d"] + ["%.17g"] * block.shape[1], delimiter=",")
+        yield gz.compress(text.getvalue().encode())
+    yield gz.flush()
+
+
+@blueprint.route("/datasets")
+def datasets():
+    """list manifest index runs, filtered by walker, time, graph, tag, max_nsites"""
+    filters = {
+        col: request.args[col]
+        for col in ("walker", "time", "graph", "tag")
+        if col in request.args
+    }
+    max_nsites = request.args.get("max_nsites", type=int)
+    return jsonify(storage.runs(max_nsites, **filters))
+
+
+@blueprint.route("/datasets/<name>/<tab>")
+def dataset(name: str, tab: str):
+    """
+    stream table tab (pdf, std, ...) of run name, sliced by steps and
+    sites start:stop ranges, as npy or gzip csv format, with etag
+    """
+    found = storage.runs(name=name)
+    if not found or f"{name}_{tab}" not in found[0]["tables"]:
+        abort(404, description=f"{name} run has no {tab} table")
+    run = found[0]
+    fmt = request.args.get("format", "npy")
+    if fmt not in FORMATS:
+        abort(400, description=f"{fmt} format not planned to be implemented")
+    arr = storage.load(f"{name}_{tab}", storage=run["storage"])
+    # one column tables (std) are read as (n, 1) from sqlite
+    if arr.ndim == 2 and arr.shape[1] == 1:
+        arr = arr.reshape(-1)
+    steps = _range("steps", arr.shape[0])
+    sites = _range("sites", arr.shape[1] if arr.ndim == 2 else 1)
+    etag = hashlib.sha256(
+        f"{run['checksum']}:{tab}:{steps}:{sites}:{fmt}".encode()
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    mimetype, ext = FORMATS[fmt]
+    stream = dict(npy=_npy, csv=_csv)[fmt](arr, steps, sites)
+    return Response(
+        stream,
+        mimetype=mimetype,
+        headers={
+            "ETag": f'"{etag}"',
+            "Content-Disposition": f"attachment; filename={name}_{tab}.{ext}",
+        },
+    )
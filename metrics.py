@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+# histograms buckets: latency seconds and payload bytes
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+BYTES_BUCKETS = tuple(256 * 4**k for k in range(10))
+
+# shared dir of gunicorn workers samples, merged on render, and seconds
+# between writes of this worker samples
+METRICS_DIR = os.environ.get(
+    "RWALK_METRICS_DIR", os.path.join(tempfile.gettempdir(), "rwalk-metrics")
+)
+METRICS_FLUSH = 1.0
+
+_METRICS = list()
+
+
+def _labels(names: tuple, values: tuple, extra="") -> str:
+    """return prometheus labels string"""
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    """return exact prometheus sample value"""
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class _Metric:
+    """
+    metric with labels, registered for exposition, values are either
+    updated in place or read from fn returning {labels: value} when
+    sampled, workers samples are summed on render
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels=(), fn=None):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._values = dict()
+        _METRICS.append(self)
+
+    def samples(self) -> dict:
+        """return current values by labels"""
+        with self._lock:
+            if self.fn is not None:
+                self._values = dict(self.fn())
+            return dict(self._values)
+
+    def merge(self, workers: list) -> dict:
+        """return sum of values by labels of (alive, samples) workers"""
+        values = dict()
+        for _, samples in workers:
+            for key, value in samples.items():
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def render(self, values: dict) -> list:
+        """return exposition lines of values by labels"""
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in values.items():
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """monotonic counter"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """gauge, summed over alive workers only"""
+
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def merge(self, workers: list) -> dict:
+        return super().merge([worker for worker in workers if worker[0]])
+
+
+class Histogram(_Metric):
+    """cumulative histogram with sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        # last count is the +Inf overflow bucket
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[idx] += 1
+            self._values[labels] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        """observe seconds spent in with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {
+                key: (list(counts), total)
+                for key, (counts, total) in self._values.items()
+            }
+
+    def merge(self, workers: list) -> dict:
+        values = dict()
+        for _, samples in workers:
+            for key, (counts, total) in samples.items():
+                old_counts, old_total = values.get(key, ([0] * len(counts), 0.0))
+                values[key] = (
+                    [old + n for old, n in zip(old_counts, counts)],
+                    old_total + total,
+                )
+        return values
+
+    def render(self, values: dict) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, n in zip([f"{b:g}" for b in self.buckets] + ["+Inf"], counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def _path(pid: int) -> str:
+    """
+    return samples file of worker pid, prefixed by its parent pid so
+    that only workers of the same gunicorn master are merged
+    """
+    return os.path.join(METRICS_DIR, f"{os.getppid()}-{pid}.json")
+
+
+def _alive(pid: int) -> bool:
+    """return whether process pid is alive"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write():
+    """write this worker samples to the shared metrics dir"""
+    samples = {
+        metric.name: [[list(key), value] for key, value in metric.samples().items()]
+        for metric in _METRICS
+    }
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _path(os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="UTF-8") as f:
+        json.dump(samples, f)
+    os.replace(tmp, path)
+
+
+def _writer():
+    """write this worker samples every METRICS_FLUSH seconds"""
+    while True:
+        time.sleep(METRICS_FLUSH)
+        _write()
+
+
+def render() -> str:
+    """
+    return all metrics in prometheus text exposition format, merging
+    samples of every worker (dead workers counters and histograms are
+    kept, their gauges are dropped)
+    """
+    _write()
+    prefix = f"{os.getppid()}-"
+    workers = list()
+    for name in os.listdir(METRICS_DIR):
+        if not name.startswith(prefix) or not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), "r", encoding="UTF-8") as f:
+                samples = json.load(f)
+        except (OSError, ValueError):
+            continue
+        workers.append(
+            (
+                _alive(int(name[len(prefix) : -len(".json")])),
+                {
+                    metric: {tuple(key): value for key, value in values}
+                    for metric, values in samples.items()
+                },
+            )
+        )
+    lines = list()
+    for metric in _METRICS:
+        lines.extend(
+            metric.render(
+                metric.merge(
+                    [
+                        (alive, samples.get(metric.name, {}))
+                        for alive, samples in workers
+                    ]
+                )
+            )
+        )
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram(
+    "rwalk_request_seconds", "http requests latency", labels=("endpoint",)
+)
+RESPONSE_BYTES = Histogram(
+    "rwalk_response_bytes",
+    "http responses payload size, dash callbacks responses by callback",
+    labels=("endpoint", "callback"),
+    buckets=BYTES_BUCKETS,
+)
+CALLBACK_SECONDS = Histogram(
+    "rwalk_callback_seconds", "dash callbacks latency", labels=("callback",)
+)
+DATASET_LOAD_SECONDS = Histogram(
+    "rwalk_dataset_load_seconds", "datasets parts load time", labels=("part",)
+)
+MAX_RSS_BYTES = Gauge(
+    "rwalk_process_max_rss_bytes",
+    "workers processes peak resident memory, summed",
+    fn=lambda: {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024},
+)
+
+
+def install(server):
+    """
+    time server requests, measure responses, write this worker samples
+    in background and serve /metrics of all workers
+    """
+
+    @server.before_request
+    def _start():
+        g.start = time.perf_counter()
+
+    @server.after_request
+    def _stop(response):
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        if "start" in g:
+            REQUEST_SECONDS.observe(time.perf_counter() - g.start, endpoint)
+        # streamed responses have no length
+        if response.content_length is not None:
+            RESPONSE_BYTES.observe(
+                response.content_length, endpoint, g.get("callback", "")
+            )
+        return response
+
+    @server.route("/metrics")
+    def _metrics():
+        """prometheus text metrics of all worker processes"""
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    threading.Thread(target=_writer, name="metrics", daemon=True).start()
+
+
+class Instrumented:
+    """
+    dash app proxy whose callback decorator times the registered
+    callbacks, everything else is forwarded to the app
+    """
+
+    def __init__(self, app):
+        self._app = app
+
+    def __getattr__(self, name):
+        return getattr(self._app, name)
+
+    def callback(self, *args, **kwargs):
+        register = self._app.callback(*args, **kwargs)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def timed(*func_args, **func_kwargs):
+                if has_request_context():
+                    g.callback = func.__name__
+                with CALLBACK_SECONDS.time(func.__name__):
+                    return func(*func_args, **func_kwargs)
+
+            return register(timed)
+
+        return decorator
+
+
+def instrument(callbacks):
+    """return callbacks registration function timing every callback"""
+
+    @functools.wraps(callbacks)
+    def instrumented(_app):
+        return callbacks(Instrumented(_app))
+
+    return instrumented
@@ -1,26 +1,76 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import contextlib
+import cProfile
+import functools
 import gzip
+import hashlib
+import inspect
 import json
 import os
 import re
-import sqlite3
+import shutil
 import sys
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from time import perf_counter
 
 import networkx as nx
 import numpy as np
-import pandas as pd
 import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csgraph
+import scipy.sparse.linalg as spla
+
+import storage
+from storage import DATA_DIR
 
 # data dirs
-if os.path.exists("/data"):
-    DATA_DIR = "/data"
-    SQLITE3_DB = os.path.join(DATA_DIR, "rwalker.sqlite3")
-else:
-    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-    SQLITE3_DB = os.path.join(DATA_DIR, "rwalker.sqlite3")
-    os.makedirs(DATA_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# profiling reports dir, unset disables profiling, and cprofile stats dump
+PROFILE_DIR = os.environ.get("RWALKER_PROFILE")
+PROFILE_CPROFILE = os.environ.get("RWALKER_PROFILE_CPROFILE", "") == "1"
+
+# results cache dir and size (bytes), 0 disables the cache
+CACHE_DIR = os.environ.get("RWALKER_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+CACHE_SIZE = int(os.environ.get("RWALKER_CACHE_SIZE", 2**30))
+
+# engines version, bump when results of an engine change
+ENGINE_VERSION = "2"
+
+# seed of random graphs
+GRAPH_SEED = 0
+
+# memory budget (bytes) of time-chunked evolution
+MEM_BUDGET = int(os.environ.get("RWALKER_MEM_BUDGET", 64 * 2**20))
+
+# max number of walkers simulated by a monte carlo chunk
+MC_CHUNK = 2**18
+
+# journal of finished sweep jobs
+SWEEP_JOURNAL = os.path.join(DATA_DIR, "sweep.jsonl")
+
+# steps evolved between checkpoints of an extension
+EXTEND_CHUNK = 1000
+
+# rows buffered by streaming table sinks between appends
+SINK_BATCH = 256
+
+# observables of observables-only runs, one table each
+OBSERVABLES = ("std", "return", "ipr", "entropy", "tvd")
+
+# max number of sites evolved with dense matrices
+DENSE_LIMIT = int(os.environ.get("RWALKER_DENSE_LIMIT", 2048))
+
+# quantum walk coins
+COINS = {
+    "hadamard": np.array([[1.0, 1.0], [1.0, -1.0]]) / np.sqrt(2),
+    "grover": np.array([[0.0, 1.0], [1.0, 0.0]]),
+}
 
 
 def _die(msg: str):
@@ -29,12 +79,277 @@ def _die(msg: str):
     sys.exit(1)
 
 
-def _dump_to_sql(dataframes: list, tables: list):
-    """save input dataframes as tables inside salite3 db"""
-    engine = sqlite3.connect(SQLITE3_DB)
-    for df, table in zip(dataframes, tables):
-        df.to_sql(table, engine, if_exists="replace", index=False)
-    engine.close()
+_PROFILE = None
+
+
+@contextlib.contextmanager
+def _phase(name: str):
+    """
+    record timing and traced allocation peak of a phase of the profiled
+    run, yielding a dict of phase info where arrays are recorded by
+    shape, dtype and bytes, nested phases are named by their path,
+    no-op unless an engine run is being profiled
+    """
+    if _PROFILE is None:
+        yield dict()
+        return
+    stack = _PROFILE["stack"]
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    entry = dict(
+        phase="/".join([parent["phase"] for parent in stack[-1:]] + [name]),
+        start=perf_counter() - _PROFILE["start"],
+        seconds=0.0,
+        peak=0,
+    )
+    _PROFILE["phases"].append(entry)
+    stack.append(entry)
+    info = dict()
+    try:
+        yield info
+    finally:
+        entry["seconds"] = perf_counter() - _PROFILE["start"] - entry["start"]
+        entry["peak"] = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+        stack.pop()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], entry["peak"])
+        for key, value in info.items():
+            if isinstance(value, (np.ndarray, sp.sparray)):
+                nbytes = (
+                    value.nbytes if isinstance(value, np.ndarray) else value.data.nbytes
+                )
+                value = dict(shape=value.shape, dtype=value.dtype.str, nbytes=nbytes)
+            entry[key] = value
+
+
+def _profiled(engine):
+    """
+    profile engine runs if PROFILE_DIR is set, writing there the json
+    report of phases timings, allocation peaks and arrays sizes, plus
+    the cprofile stats (pstats format) if PROFILE_CPROFILE is set
+    """
+
+    @functools.wraps(engine)
+    def profiled(*args, **kwargs):
+        global _PROFILE
+        if not PROFILE_DIR or _PROFILE is not None:
+            return engine(*args, **kwargs)
+        params = inspect.signature(engine).bind(*args, **kwargs)
+        params.apply_defaults()
+        params = params.arguments
+        name = f"{engine.__name__}-{params['graph']}{params.get('tag', '')}"
+        _PROFILE = dict(
+            engine=engine.__name__,
+            params=params,
+            start=perf_counter(),
+            phases=list(),
+            stack=list(),
+        )
+        profiler = cProfile.Profile() if PROFILE_CPROFILE else None
+        tracemalloc.start()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            with _phase("run"):
+                result = engine(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            tracemalloc.stop()
+            report = _PROFILE
+            _PROFILE = None
+        del report["stack"], report["start"]
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(
+            os.path.join(PROFILE_DIR, f"{name}.json"), "w", encoding="UTF-8"
+        ) as f:
+            json.dump(report, f, indent=2, default=str)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+        return result
+
+    return profiled
+
+
+def _dump(arrays: list, tables: list):
+    """save input arrays as tables with the configured storage backend"""
+    with _phase("dump") as phase:
+        phase["nbytes"] = sum(arr.nbytes for arr in arrays)
+        try:
+            storage.dump(arrays, tables)
+        except ValueError as e:
+            _die(f"[ERROR] {e}")
+
+
+def _cache_key(*params) -> str:
+    """return content address of engine version, graph seed and params"""
+
+    def _encode(obj):
+        arr = np.asarray(obj)
+        if np.iscomplexobj(arr):
+            return [arr.real.tolist(), arr.imag.tolist()]
+        return arr.tolist()
+
+    payload = json.dumps([ENGINE_VERSION, GRAPH_SEED, params], default=_encode)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_entries() -> list:
+    """return cache entries (path, size, last access) from least recently used"""
+    if not os.path.isdir(CACHE_DIR):
+        return list()
+    entries = list()
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((entry.path, stat.st_size, stat.st_mtime))
+    return sorted(entries, key=lambda entry: entry[2])
+
+
+def _cache_store(path: str, write):
+    """atomically write a cache entry with write(file), then evict lru entries"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+    entries = _cache_entries()
+    size = sum(entry[1] for entry in entries)
+    for entry_path, entry_size, _ in entries:
+        if size <= CACHE_SIZE:
+            break
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+        size -= entry_size
+
+
+def _cached(compute, *params, phase="evolve", part="pdf") -> np.ndarray:
+    """
+    return the array computed by compute, stored in the cache by params,
+    profiled as phase recording the array as part
+    """
+    with _phase(phase) as info:
+        if not CACHE_SIZE:
+            info["cache"] = "off"
+            info[part] = arr = compute()
+            return arr
+        path = os.path.join(CACHE_DIR, f"{_cache_key(*params)}.npy")
+        try:
+            info[part] = arr = np.load(path)
+            info["cache"] = "hit"
+            os.utime(path)
+            return arr
+        except (OSError, ValueError):
+            pass
+        info["cache"] = "miss"
+        info[part] = arr = compute()
+        _cache_store(path, lambda f: np.save(f, arr))
+        return arr
+
+
+def _cached_state(compute, *params):
+    """
+    return (pdf, final state) computed at once by compute, each
+    stored in the cache by params
+    """
+    computed = dict()
+
+    def _compute(part: str) -> np.ndarray:
+        if not computed:
+            computed["pdf"], computed["state"] = compute()
+        return computed[part]
+
+    pdf = _cached(lambda: _compute("pdf"), *params)
+    state = _cached(
+        lambda: _compute("state"), *params, "state", phase="state", part="state"
+    )
+    return pdf, state
+
+
+def _draw_cached(graph: str, dim: int, walker: str, time: str):
+    """save the graph as cytoscape compressed json, reusing the cached drawing"""
+    dest = os.path.join(DATA_DIR, f"{walker}-{graph}-{time}.json.gz")
+    with _phase("draw") as phase:
+        if not CACHE_SIZE:
+            phase["cache"] = "off"
+            _gen_laplacian_matrix(graph, dim, walker, time, sparse=True)
+            return
+        path = os.path.join(CACHE_DIR, f"{_cache_key('draw', graph, dim)}.json.gz")
+        try:
+            shutil.copyfile(path, dest)
+            phase["cache"] = "hit"
+            os.utime(path)
+            return
+        except OSError:
+            pass
+        phase["cache"] = "miss"
+        _gen_laplacian_matrix(graph, dim, walker, time, sparse=True)
+        with open(dest, "rb") as src:
+            _cache_store(path, lambda f: shutil.copyfileobj(src, f))
+
+
+def cache_inspect():
+    """print cache entries from the most recently used"""
+    entries = _cache_entries()
+    size = sum(entry[1] for entry in entries)
+    print(
+        f"[INFO] cache {CACHE_DIR}: {len(entries)} entries, {size}/{CACHE_SIZE} bytes"
+    )
+    for path, entry_size, mtime in reversed(entries):
+        print(f"{os.path.basename(path)}\t{entry_size}\t{mtime:.0f}")
+
+
+def cache_purge():
+    """remove all cache entries"""
+    entries = _cache_entries()
+    for path, _, _ in entries:
+        os.remove(path)
+    print(f"[INFO] cache {CACHE_DIR}: {len(entries)} entries purged")
+
+
+def _save_tables(name: str, pdf: np.ndarray, sites, params: dict, extra=None):
+    """
+    save the pdf table, and if sites are defined the std table,
+    plus extra tables (suffix: array), with name prefix,
+    then record the run params in the manifest index
+    """
+    arrays, tables = [pdf], [f"{name}_pdf"]
+    if sites is not None:
+        # compute std
+        with _phase("std") as phase:
+            var = pdf @ sites**2
+            phase["std"] = std = np.sqrt(var)
+        arrays.append(std)
+        tables.append(f"{name}_std")
+    for suffix, arr in (extra or dict()).items():
+        arrays.append(arr)
+        tables.append(f"{name}_{suffix}")
+    _dump(arrays, tables)
+    draw = params.pop("draw", None)
+    with _phase("index"):
+        try:
+            storage.register(name, pdf, tables, params, draw=draw)
+        except ValueError as e:
+            _die(f"[ERROR] {e}")
+
+
+def _checkpoint(step: int, dt: float, state: np.ndarray) -> np.ndarray:
+    """
+    return checkpoint table of evolution final state: one row with
+    step, time step and state values (complex as real, imag pairs)
+    """
+    values = np.ascontiguousarray(state).view(float).ravel()
+    return np.concatenate(([step, dt], values))[np.newaxis]
+
+
+def _restore(checkpoint: np.ndarray, walker: str):
+    """return step, time step and flat state of checkpoint table"""
+    step, dt, values = int(checkpoint[0, 0]), checkpoint[0, 1], checkpoint[0, 2:]
+    state = np.array(values)
+    return step, dt, state.view(complex) if walker == "quantum" else state
 
 
 def _fix_cyto_json(graph: str, cyto_json: dict) -> dict:
@@ -46,44 +361,57 @@ def _fix_cyto_json(graph: str, cyto_json: dict) -> dict:
                 - (len(cyto_json["elements"]["nodes"]) - 1) * 0.5
             )
     cyto_str = json.dumps(cyto_json)
-    cyto_str = re.sub(r'"source":\ (\d?\d?\d)', r'"source": "\1"', cyto_str)
-    cyto_str = re.sub(r'"target":\ (\d?\d?\d)', r'"target": "\1"', cyto_str)
+    cyto_str = re.sub(r'"source":\ (\d+)', r'"source": "\1"', cyto_str)
+    cyto_str = re.sub(r'"target":\ (\d+)', r'"target": "\1"', cyto_str)
     return json.loads(cyto_str)
 
 
-def _gen_laplacian_matrix(
-    graph: str, dim: int, walker: str, time: str, draw=True
-) -> np.ndarray:
+def _gen_adjacency_matrix(graph: str, dim: int) -> sp.csr_array:
     """
-    generate laplacian matrix of given graph and dim,
-    and if draw is True save the graph as cytoscape json format
+    generate sparse adjacency matrix of given graph and dim,
+    for grid and torus graphs dim must be a square number,
+    for hypercube graph dim must be a power of two
     """
-    A = np.zeros((dim, dim))
-    if graph == "line":
-        for i in np.arange(A.shape[0]):
-            for j in np.arange(A.shape[1]):
-                if ((j == i - 1) and (i - 1 >= 0)) or (
-                    (j == i + 1) and (i + 1 < A.shape[0])
-                ):
-                    A[i][j] = 1.0
-    elif graph == "ring":
-        for i in np.arange(A.shape[0]):
-            for j in np.arange(A.shape[1]):
-                if ((j == i - 1) and (i - 1 >= 0)) or (
-                    (j == i + 1) and (i + 1 < A.shape[0])
-                ):
-                    A[i][j] = 1.0
-        A[0][dim - 1] = 1.0
-        A[dim - 1][0] = 1.0
+    if graph == "line" or graph == "ring":
+        rows = np.arange(0, dim - 1, 1)
+        cols = rows + 1
+        if graph == "ring":
+            rows = np.append(rows, dim - 1)
+            cols = np.append(cols, 0)
+        A = sp.coo_array((np.ones(rows.size), (rows, cols)), shape=(dim, dim))
+        A = A + A.T
     elif graph == "rand":
-        G = nx.random_regular_graph(2, dim, seed=0)
-        A = nx.to_numpy_array(G)
+        G = nx.random_regular_graph(2, dim, seed=GRAPH_SEED)
+        A = nx.to_scipy_sparse_array(G, format="csr")
+    elif graph == "grid" or graph == "torus":
+        side = int(np.sqrt(dim))
+        if not side * side == dim:
+            _die(f"[ERROR] {graph} graph needs a square number of sites")
+        P = _gen_adjacency_matrix("line" if graph == "grid" else "ring", side)
+        eye = sp.eye_array(side)
+        A = sp.kron(eye, P) + sp.kron(P, eye)
+    elif graph == "hypercube":
+        ndim = int(np.log2(dim))
+        if not 2**ndim == dim:
+            _die(f"[ERROR] {graph} graph needs a power of two number of sites")
+        rows = np.repeat(np.arange(0, dim, 1), ndim)
+        cols = rows ^ (1 << np.tile(np.arange(0, ndim, 1), dim))
+        A = sp.coo_array((np.ones(rows.size), (rows, cols)), shape=(dim, dim))
+    elif graph == "complete":
+        rows, cols = np.nonzero(~np.eye(dim, dtype=bool))
+        A = sp.coo_array((np.ones(rows.size), (rows, cols)), shape=(dim, dim))
     else:
         _die(f"[ERROR] {graph} graph not planned to be implemented")
-    if not np.allclose(A, A.T, rtol=1e-5, atol=1e-8):
-        _die(f"[ERROR] adjacency matrix for {graph} graph it's not symmetric")
-    if draw:
-        G = nx.from_numpy_array(A)
+    A = sp.csr_array(A, dtype=float)
+    A.sum_duplicates()
+    A.data[:] = 1.0
+    return A
+
+
+def _draw_graph(graph: str, A: sp.csr_array, walker: str, time: str):
+    """save the graph of given adjacency matrix as cytoscape compressed json"""
+    with _phase("cytoscape_json"):
+        G = nx.from_scipy_sparse_array(A)
         cyto_json = nx.cytoscape_data(G)
         cyto_json = _fix_cyto_json(graph, cyto_json)
         with gzip.open(
@@ -92,256 +420,1562 @@ def _gen_laplacian_matrix(
             encoding="UTF-8",
         ) as gz:
             json.dump(cyto_json, gz)
-    return np.diag(np.sum(A, axis=0)) - A
 
 
-def classic_dtime(graph: str, init_site: int, limit: int, nsteps: int):
+def _gen_laplacian_matrix(
+    graph: str, dim: int, walker: str, time: str, draw=True, sparse=False
+):
     """
-    save two tables inside sqlite3 db:
-        1. crw_pdf - row: nsteps+1, col: limit*2+1
-        2. crw_std - row: nsteps+1, col: 1
-    containg the results of:
-        classic random walker discrete-time on-graph simulation
-    save the graph rappresentation as cytoscape compressed json
+    generate laplacian matrix of given graph and dim,
+    as sparse csr array if sparse is True otherwise as dense array,
+    and if draw is True save the graph as cytoscape json format
+    """
+    with _phase("laplacian") as phase:
+        A = _gen_adjacency_matrix(graph, dim)
+        if (A != A.T).nnz:
+            _die(f"[ERROR] adjacency matrix for {graph} graph it's not symmetric")
+        if draw:
+            _draw_graph(graph, A, walker, time)
+        L = sp.diags_array(A.sum(axis=0)) - A
+        phase["laplacian"] = L = sp.csr_array(L) if sparse else L.toarray()
+        return L
+
+
+def _transition_matrix(A: sp.csr_array) -> sp.csr_array:
+    """return column stochastic transition matrix A D^-1 of adjacency matrix"""
+    return sp.csr_array(A @ sp.diags_array(1.0 / A.sum(axis=0)))
+
+
+def _graph_sites(graph: str, limit: int):
+    """
+    return number of sites and sites coordinates used to compute std,
+    for ring graph coordinates are remapped around the origin,
+    for other graphs std is not defined and sites are None:
+        1. rand, complete - nsites: limit+1
+        2. grid, torus - nsites: (limit+1)**2
+        3. hypercube - nsites: 2**limit
     """
-    # parameters
     if graph == "line":
         nsites = limit * 2 + 1
         sites = np.arange(-limit, limit + 1, 1)
     elif graph == "ring":
         nsites = limit + 1
-        sites = np.arange(0, limit + 1, 1)
+        sites = np.concatenate(
+            (np.arange(0, int(limit * 0.5) + 1, 1), np.arange(-int(limit * 0.5), 0, 1))
+        )
+    elif graph == "rand" or graph == "complete":
+        nsites = limit + 1
+        sites = None
+    elif graph == "grid" or graph == "torus":
+        nsites = (limit + 1) ** 2
+        sites = None
+    elif graph == "hypercube":
+        nsites = 2**limit
+        sites = None
     else:
         _die(f"[ERROR] {graph} graph not planned to be implemented")
-    # init pdf
-    pdf = np.zeros((nsteps + 1, nsites))
+    return nsites, sites
+
+
+def _init_pdf(graph: str, init, limit: int, nsites: int) -> np.ndarray:
+    """
+    return initial pdf from a site, or a batch of initial pdfs
+    (batch along first axis) from a sequence of sites or from
+    an array of initial distributions
+    """
+    offset = limit if graph == "line" else 0
+    if np.ndim(init) == 0:
+        pdf = np.zeros(nsites)
+        pdf[int(init) + offset] = 1.0
+        return pdf
+    init = np.asarray(init)
+    if np.issubdtype(init.dtype, np.integer) and init.ndim == 1:
+        pdf = np.zeros((init.size, nsites))
+        pdf[np.arange(init.size), init + offset] = 1.0
+        return pdf
+    if init.shape[-1] != nsites or init.ndim > 2:
+        _die(f"[ERROR] initial distributions must have shape (batch, {nsites})")
+    return init.astype(float)
+
+
+def _classic_dtime_step(graph: str, pdf: np.ndarray, out: np.ndarray):
+    """
+    evolve pdf (or batch of pdfs) of one step writing into out, as the
+    transition matrix A D^-1: line graph ends have one neighbour and
+    send all their probability inwards, ring graph is periodic
+    """
     if graph == "line":
-        init_idx = init_site + limit
+        np.add(pdf[..., :-2], pdf[..., 2:], out=out[..., 1:-1])
+        out[..., 1:-1] *= 0.5
+        out[..., 1] += 0.5 * pdf[..., 0]
+        out[..., -2] += 0.5 * pdf[..., -1]
+        out[..., 0] = 0.5 * pdf[..., 1]
+        out[..., -1] = 0.5 * pdf[..., -2]
     else:
-        init_idx = init_site
-    pdf[0][init_idx] = 1.0
+        np.add(pdf[..., :-2], pdf[..., 2:], out=out[..., 1:-1])
+        out[..., 0] = pdf[..., -1] + pdf[..., 1]
+        out[..., -1] = pdf[..., -2] + pdf[..., 0]
+        out *= 0.5
+
+
+def _collect(steps, nrows: int):
+    """return (rows, final state) of steps generator, rows stacked"""
+    rows = None
+    for i in range(nrows + 1):
+        try:
+            row = next(steps)
+        except StopIteration as stop:
+            return rows, stop.value
+        if rows is None:
+            rows = np.empty((nrows,) + row.shape)
+        rows[i] = row
+
+
+def classic_dtime_steps(graph: str, init, limit: int, nsteps: int):
+    """
+    yield pdf (or batch of pdfs) of classic random walker discrete-time
+    on-graph at each step from init (see classic_dtime_evolve), keeping
+    in memory only two steps: a yielded pdf is overwritten by the next
+    steps, so consumers copy what they keep, return the final pdf
+    """
+    nsites, _ = _graph_sites(graph, limit)
+    pdf = _init_pdf(graph, init, limit, nsites)
+    out = np.empty_like(pdf)
+    T = None
+    if not (graph == "line" or graph == "ring"):
+        T = _transition_matrix(_gen_adjacency_matrix(graph, nsites))
+    yield pdf
+    for _ in range(nsteps):
+        if T is None:
+            _classic_dtime_step(graph, pdf, out)
+        else:
+            out[...] = (T @ pdf.T).T
+        pdf, out = out, pdf
+        yield pdf
+    return pdf.copy()
+
+
+def classic_dtime_evolve(graph: str, init, limit: int, nsteps: int) -> np.ndarray:
+    """
+    evolve classic random walker discrete-time on-graph starting from init,
+    that can be:
+        1. a site - return pdf with shape (nsteps+1, nsites)
+        2. a sequence of sites or an array of initial distributions
+           - return pdfs with shape (nsteps+1, batch, nsites)
+    line and ring graphs are evolved with stencil updates, other graphs
+    with the sparse transition matrix
+    """
+    steps = classic_dtime_steps(graph, init, limit, nsteps)
+    pdf, _ = _collect(steps, nsteps + 1)
+    return pdf
+
+
+@_profiled
+def classic_dtime(graph: str, init_site: int, limit: int, nsteps: int, tag=""):
+    """
+    save tables with the storage backend:
+        1. crw_pdf - row: nsteps+1, col: limit*2+1
+        2. crw_std - row: nsteps+1, col: 1
+        3. crw_state - row: 1, final state checkpoint to extend the run
+    containg the results of:
+        classic random walker discrete-time on-graph simulation
+    save the graph rappresentation as cytoscape compressed json,
+    tag is appended to tables and json names, return the pdf
+    (cached by parameters)
+    """
+    # parameters
+    nsites, sites = _graph_sites(graph, limit)
     # evolve pdf
-    if graph == "line":
-        for i in np.arange(1, pdf.shape[0], 1):
-            for j in np.arange(0, pdf.shape[1], 1):
-                if j + 1 >= pdf.shape[1]:
-                    pdf[i][j] = 1.0 * pdf[i - 1][j - 1]
-                elif j - 1 < 0:
-                    pdf[i][j] = 1.0 * pdf[i - 1][j + 1]
-                else:
-                    pdf[i][j] = 0.5 * pdf[i - 1][j - 1] + 0.5 * pdf[i - 1][j + 1]
-    else:
-        for i in np.arange(1, pdf.shape[0], 1):
-            for j in np.arange(0, pdf.shape[1], 1):
-                if j - 1 == -1:
-                    pdf[i][j] = 0.5 * pdf[i - 1][limit] + 0.5 * pdf[i - 1][j + 1]
-                elif j + 1 == limit + 1:
-                    pdf[i][j] = 0.5 * pdf[i - 1][j - 1] + 0.5 * pdf[i - 1][0]
-                else:
-                    pdf[i][j] = 0.5 * pdf[i - 1][j - 1] + 0.5 * pdf[i - 1][j + 1]
+    pdf = _cached(
+        lambda: classic_dtime_evolve(graph, init_site, limit, nsteps),
+        "classic_dtime",
+        graph,
+        init_site,
+        limit,
+        nsteps,
+    )
     # draw graph
-    _gen_laplacian_matrix(graph, nsites, "classic", "discrete")
-    # compute std
-    if graph == "ring":
-        sites = np.concatenate(
-            (np.arange(0, int(limit * 0.5) + 1, 1), np.arange(-int(limit * 0.5), 0, 1))
-        )
-    var = pdf @ sites**2
-    std = np.sqrt(var)
+    _draw_cached(graph, nsites, "classic", f"discrete{tag}")
     # save tables
-    pdf_df = pd.DataFrame(pdf)
-    std_df = pd.DataFrame(std.T)
-    _dump_to_sql([pdf_df, std_df], [f"crw_{graph}_pdf", f"crw_{graph}_std"])
+    _save_tables(
+        f"crw_{graph}{tag}",
+        pdf,
+        sites,
+        dict(
+            walker="classic",
+            time="discrete",
+            graph=graph,
+            tag=tag,
+            init_site=init_site,
+            limit=limit,
+            nsteps=nsteps,
+            draw=f"classic-{graph}-discrete{tag}.json.gz",
+        ),
+        dict(state=_checkpoint(nsteps, 1.0, pdf[-1])),
+    )
+    return pdf
+
+
+def _time_grid(nsteps: int, times=None) -> np.ndarray:
+    """
+    return evolution times, by default nsteps+1 uniform times,
+    otherwise the user specified non-decreasing times grid
+    """
+    if times is None:
+        return np.linspace(0, nsteps + 1, nsteps + 1)
+    times = np.asarray(times, dtype=float)
+    if not times.ndim == 1 or np.any(times < 0) or np.any(np.diff(times) < 0):
+        _die("[ERROR] times grid must be a non-decreasing sequence of times >= 0")
+    return times
+
+
+def _time_step(nsteps: int) -> float:
+    """return time step of the default times grid"""
+    return (nsteps + 1) / nsteps if nsteps else 1.0
+
+
+def _spectral_evolve(
+    eig_vals: np.ndarray,
+    eig_vecs: np.ndarray,
+    psi0: np.ndarray,
+    times: np.ndarray,
+    factor: complex,
+    mem_budget: int = MEM_BUDGET,
+):
+    """
+    yield (start, states) chunks of psi(t) = V exp(factor*E*t) V^dagger psi0
+    evaluated on the whole times x sites grid, chunks over times are sized
+    to keep phases and states arrays inside mem_budget bytes
+    """
+    coeffs = eig_vecs.conj().T @ psi0
+    dtype = np.result_type(factor, coeffs)
+    rows = max(1, mem_budget // (2 * eig_vals.size * dtype.itemsize))
+    for start in np.arange(0, times.size, rows):
+        phases = np.exp(factor * np.outer(times[start : start + rows], eig_vals))
+        phases *= coeffs
+        yield start, phases @ eig_vecs.T
 
 
-def classic_ctime(graph: str, init_site: int, limit: int, nsteps: int):
+def _krylov_evolve(
+    H: sp.csr_array,
+    psi0: np.ndarray,
+    times: np.ndarray,
+    factor: complex,
+    mem_budget: int = MEM_BUDGET,
+):
+    """
+    yield (start, states) chunks of psi(t) = exp(factor*H*t) psi0 using
+    expm_multiply on the sparse generator, uniform chunks of times are
+    evaluated at once otherwise time steps are evolved one by one
+    """
+    A = factor * H
+    dtype = np.result_type(factor, psi0)
+    rows = max(1, mem_budget // (psi0.size * dtype.itemsize))
+    prev, state = 0.0, psi0.astype(dtype)
+    for start in np.arange(0, times.size, rows):
+        chunk = times[start : start + rows]
+        step = chunk[1] - chunk[0] if chunk.size > 2 else 0.0
+        if step > 0 and np.allclose(np.diff(chunk), step):
+            if chunk[0] > prev:
+                state = spla.expm_multiply((chunk[0] - prev) * A, state)
+            states = spla.expm_multiply(
+                A, state, start=0.0, stop=chunk[-1] - chunk[0], num=chunk.size
+            )
+        else:
+            states = np.empty((chunk.size, psi0.size), dtype=dtype)
+            for i, time in enumerate(chunk):
+                if time > prev:
+                    state = spla.expm_multiply((time - prev) * A, state)
+                states[i], prev = state, time
+        prev, state = chunk[-1], states[-1]
+        yield start, states
+
+
+def _propagator_evolve(H: np.ndarray, pdf0: np.ndarray, times: np.ndarray):
+    """
+    yield (start, states) chunks of pdf(t) = expm(-H*t) pdf0 stepping
+    with propagators expm(-dt*H) computed once per distinct time step
+    """
+    propagators = dict()
+    prev, state = 0.0, pdf0
+    for i, time in enumerate(times):
+        dt = round(time - prev, 12)
+        if dt > 0:
+            if dt not in propagators:
+                propagators[dt] = la.expm(-dt * H)
+            state = propagators[dt] @ state
+        prev = time
+        yield i, state[np.newaxis]
+
+
+def _ctime_method(method, nsites: int) -> str:
+    """return evolution method, by default dense eigh for small graphs otherwise krylov"""
+    if method is None:
+        return "eigh" if nsites <= DENSE_LIMIT else "krylov"
+    if method not in ("eigh", "propagator", "krylov"):
+        _die(f"[ERROR] {method} method not planned to be implemented")
+    return method
+
+
+def classic_ctime_steps(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.15,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+    state=None,
+):
+    """
+    yield pdf of classic random walker continuous-time on-graph at each
+    time (see classic_ctime_evolve), evolved in chunks of times inside
+    mem_budget bytes, return the final pdf
     """
-    save two tables inside sqlite3 db:
+    times = _time_grid(nsteps, times)
+    nsites, _ = _graph_sites(graph, limit)
+    method = _ctime_method(method, nsites)
+    # evolve matrix
+    H = gamma * _gen_laplacian_matrix(
+        graph, nsites, "classic", "continuous", False, sparse=method == "krylov"
+    )
+    # init pdf
+    if state is None:
+        pdf0 = np.zeros(nsites)
+        pdf0[init_site + limit if graph == "line" else init_site] = 1.0
+    else:
+        pdf0 = np.asarray(state, dtype=float)
+    # evolve pdf
+    if method == "eigh":
+        eig_vals, eig_vecs = la.eigh(H)
+        chunks = _spectral_evolve(eig_vals, eig_vecs, pdf0, times, -1.0, mem_budget)
+    elif method == "krylov":
+        chunks = _krylov_evolve(H, pdf0, times, -1.0, mem_budget)
+    else:
+        chunks = _propagator_evolve(H, pdf0, times)
+    pdf = pdf0
+    for _, chunk in chunks:
+        # drop round-off negative probabilities
+        chunk = np.maximum(chunk, 0.0)
+        yield from chunk
+        pdf = chunk[-1]
+    return pdf
+
+
+def classic_ctime_evolve(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.15,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+    state=None,
+) -> np.ndarray:
+    """
+    evolve classic random walker continuous-time on-graph computing
+    the evolution once and reusing it across all times, method can be:
+        1. eigh - eigendecomposition of the symmetric laplacian
+        2. propagator - expm(-dt*H) computed once per distinct time step
+        3. krylov - expm_multiply of the sparse laplacian
+        4. None - eigh up to DENSE_LIMIT sites, krylov above
+    starting from init_site or from the initial pdf state if given,
+    return pdf with shape (times, nsites)
+    """
+    steps = classic_ctime_steps(
+        graph, init_site, limit, nsteps, gamma, method, times, mem_budget, state
+    )
+    pdf, _ = _collect(steps, _time_grid(nsteps, times).size)
+    return pdf
+
+
+@_profiled
+def classic_ctime(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.15,
+    method=None,
+    times=None,
+    tag="",
+):
+    """
+    save tables with the storage backend:
         1. crw_ct_pdf - row: nsteps+1, col: limit*2+1
         2. crw_ct_std - row: nsteps+1, col: 1
+        3. crw_ct_state - row: 1, final state checkpoint to extend the run
     containg the results of:
         classic random walker continuous-time on-graph simulation
-    save the graph rappresentation as cytoscape compressed json
+    save the graph rappresentation as cytoscape compressed json,
+    tag is appended to tables and json names, return the pdf
+    (cached by parameters)
     """
     # parameters
-    gamma = 0.15
-    times = np.linspace(0, nsteps + 1, nsteps + 1)
-    if graph == "line":
-        nsites = limit * 2 + 1
-        sites = np.arange(-limit, limit + 1, 1)
-    elif graph == "ring" or graph == "rand":
-        nsites = limit + 1
-        sites = np.arange(0, limit + 1, 1)
+    nsites, sites = _graph_sites(graph, limit)
+    # evolve pdf
+    pdf = _cached(
+        lambda: classic_ctime_evolve(
+            graph, init_site, limit, nsteps, gamma, method, times
+        ),
+        "classic_ctime",
+        graph,
+        init_site,
+        limit,
+        nsteps,
+        gamma,
+        method,
+        times,
+    )
+    # draw graph
+    _draw_cached(graph, nsites, "classic", f"continuous{tag}")
+    # save tables
+    _save_tables(
+        f"crw_{graph}_ct{tag}",
+        pdf,
+        sites,
+        dict(
+            walker="classic",
+            time="continuous",
+            graph=graph,
+            tag=tag,
+            init_site=init_site,
+            limit=limit,
+            nsteps=nsteps,
+            gamma=gamma,
+            method=method,
+            draw=f"classic-{graph}-continuous{tag}.json.gz",
+        ),
+        (
+            dict(state=_checkpoint(nsteps, _time_step(nsteps), pdf[-1]))
+            if times is None
+            else None
+        ),
+    )
+    return pdf
+
+
+def _mc_chunk(job: dict) -> dict:
+    """
+    simulate a chunk of classic random walkers with its own generator stream,
+    accumulating positions histogram (and first passage times histogram)
+    step by step so that walkers paths are never held in memory
+    """
+    rng = np.random.default_rng(job["seed"])
+    indptr, indices, deg = job["indptr"], job["indices"], job["deg"]
+    times, nwalkers = job["times"], job["nwalkers"]
+    hist = np.zeros((times.size, deg.size), dtype=np.int64)
+    fpt = np.zeros(times.size, dtype=np.int64)
+    paths = np.empty((times.size, job["npaths"]), dtype=np.int64)
+    pos = np.full(nwalkers, job["init_idx"], dtype=np.int64)
+    hit = pos == job["target"]
+    fpt[0] = np.count_nonzero(hit)
+    if job["time"] == "continuous":
+        rates = job["gamma"] * deg
+        clock = rng.exponential(1.0 / rates[pos])
+    for i, time in enumerate(times):
+        if i > 0 and job["time"] == "discrete":
+            # jump to a uniformly chosen neighbour
+            u = rng.random(nwalkers)
+            pos = indices[indptr[pos] + (u * deg[pos]).astype(np.int64)]
+            new_hit = ~hit & (pos == job["target"])
+            fpt[i] = np.count_nonzero(new_hit)
+            hit |= new_hit
+        elif i > 0:
+            # gillespie jumps of walkers whose clock expired before time
+            idx = np.flatnonzero(clock <= time)
+            while idx.size:
+                u = rng.random(idx.size)
+                pos[idx] = indices[indptr[pos[idx]] + (u * deg[pos[idx]]).astype(int)]
+                new_hit = idx[~hit[idx] & (pos[idx] == job["target"])]
+                np.add.at(fpt, np.searchsorted(times, clock[new_hit]), 1)
+                hit[new_hit] = True
+                clock[idx] += rng.exponential(1.0 / rates[pos[idx]])
+                idx = idx[clock[idx] <= time]
+        hist[i] = np.bincount(pos, minlength=deg.size)
+        paths[i] = pos[: job["npaths"]]
+    return dict(hist=hist, fpt=fpt, paths=paths)
+
+
+def classic_mc(
+    graph: str,
+    time: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    nwalkers: int = 10**6,
+    seed: int = 0,
+    gamma: float = 0.15,
+    target=None,
+    npaths: int = 0,
+    nprocs=None,
+    tag="",
+) -> dict:
+    """
+    monte carlo ensemble of nwalkers classic random walkers on-graph,
+    discrete-time jumps or gillespie continuous-time jumps, split in chunks
+    with independent seeded generator streams across nprocs processes,
+    save tables with the storage backend:
+        1. crw_mc_pdf - row: nsteps+1, col: nsites - empirical pdf
+        2. crw_mc_std - row: nsteps+1, col: 1 - empirical std (if defined)
+        3. crw_mc_tvd - row: nsteps+1, col: 1 - total variation distance
+           between empirical and exact pdf
+        4. crw_mc_fpt - row: nsteps+1, col: 1 - first passage times
+           histogram on target site (if target)
+    return a dict with the above arrays, and first npaths walkers paths
+    """
+    if time not in ("discrete", "continuous"):
+        _die(f"[ERROR] {time} time not planned to be implemented")
+    nsites, sites = _graph_sites(graph, limit)
+    A = _gen_adjacency_matrix(graph, nsites)
+    offset = limit if graph == "line" else 0
+    times = np.arange(0, nsteps + 1, 1) if time == "discrete" else _time_grid(nsteps)
+    # walkers chunks
+    sizes = np.full(nwalkers // MC_CHUNK, MC_CHUNK)
+    if nwalkers % MC_CHUNK:
+        sizes = np.append(sizes, nwalkers % MC_CHUNK)
+    streams = np.random.SeedSequence(seed).spawn(sizes.size)
+    jobs = [
+        dict(
+            time=time,
+            gamma=gamma,
+            times=times,
+            indptr=A.indptr,
+            indices=A.indices,
+            deg=np.diff(A.indptr),
+            init_idx=init_site + offset,
+            target=-1 if target is None else target + offset,
+            nwalkers=int(size),
+            npaths=min(npaths, int(size)) if k == 0 else 0,
+            seed=stream,
+        )
+        for k, (size, stream) in enumerate(zip(sizes, streams))
+    ]
+    # simulate
+    hist = np.zeros((times.size, nsites), dtype=np.int64)
+    fpt = np.zeros(times.size, dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=nprocs) as pool:
+        for k, res in enumerate(pool.map(_mc_chunk, jobs)):
+            hist += res["hist"]
+            fpt += res["fpt"]
+            if k == 0:
+                paths = res["paths"] - offset
+    pdf = hist / nwalkers
+    # exact pdf
+    if time == "discrete":
+        T = _transition_matrix(A)
+        exact = np.empty_like(pdf)
+        exact[0] = 0.0
+        exact[0][init_site + offset] = 1.0
+        for i in np.arange(1, exact.shape[0], 1):
+            exact[i] = T @ exact[i - 1]
     else:
-        _die(f"[ERROR] {graph} graph not planned to be implemented")
-    # evolve matrix
-    H = gamma * _gen_laplacian_matrix(graph, nsites, "classic", "continuous")
-    # init pdf
-    pdf = np.zeros((times.size, nsites))
+        exact = classic_ctime_evolve(graph, init_site, limit, nsteps, gamma)
+    tvd = 0.5 * np.abs(pdf - exact).sum(axis=1)
+    print(
+        f"[INFO] {nwalkers} walkers on {graph} graph, "
+        f"max total variation distance from exact pdf {tvd.max():.3e}"
+    )
+    # save tables
+    name = f"crw_{graph}{'_ct' if time == 'continuous' else ''}_mc{tag}"
+    extra = dict(tvd=tvd)
+    if target is not None:
+        extra["fpt"] = fpt
+    _save_tables(
+        name,
+        pdf,
+        sites,
+        dict(
+            walker="classic",
+            time=time,
+            graph=graph,
+            tag=f"_mc{tag}",
+            init_site=init_site,
+            limit=limit,
+            nsteps=nsteps,
+            gamma=gamma if time == "continuous" else None,
+            nwalkers=nwalkers,
+            seed=seed,
+            target=target,
+        ),
+        extra,
+    )
+    return dict(pdf=pdf, exact=exact, tvd=tvd, fpt=fpt, paths=paths)
+
+
+def _coin_matrix(coin) -> np.ndarray:
+    """return coin 2x2 unitary matrix from its name or from the matrix itself"""
+    if isinstance(coin, str):
+        if coin not in COINS:
+            _die(f"[ERROR] {coin} coin not planned to be implemented")
+        return COINS[coin]
+    coin = np.asarray(coin, dtype=complex)
+    if not coin.shape == (2, 2) or not np.allclose(
+        coin @ coin.conj().T, np.eye(2), rtol=1e-5, atol=1e-8
+    ):
+        _die("[ERROR] coin must be a 2x2 unitary matrix")
+    return coin
+
+
+def _quantum_dtime_step(
+    graph: str, wave: np.ndarray, coin: np.ndarray, out: np.ndarray
+):
+    """
+    evolve spinor state wave (2, nsites) of one step writing into out:
+    apply coin on every site, then shift component 0 right and component 1 left,
+    line graph has absorbing boundaries and ring graph periodic ones
+    """
+    flip = coin @ wave
     if graph == "line":
-        init_idx = init_site + limit
+        out[0][1:-1] = flip[0][:-2]
+        out[1][1:-1] = flip[1][2:]
+        out[:, 0] = 0.0
+        out[:, -1] = 0.0
+    else:
+        out[0][1:] = flip[0][:-1]
+        out[0][0] = flip[0][-1]
+        out[1][:-1] = flip[1][1:]
+        out[1][-1] = flip[1][0]
+
+
+def _grover_arcs(A: sp.csr_array):
+    """
+    return arcs layout of coined walk on adjacency matrix A, arcs leaving
+    every site are contiguous (csr order):
+        1. offsets of first arc leaving every site
+        2. degree of every site
+        3. flip-flop shift permutation, arc u->v receives arc v->u
+    """
+    A = sp.csr_array(A)
+    A.sort_indices()
+    deg = np.diff(A.indptr)
+    rows = np.repeat(np.arange(0, deg.size, 1), deg)
+    flip = np.lexsort((rows, A.indices))
+    return A.indptr[:-1], deg, flip
+
+
+def _grover_arcs_step(
+    wave: np.ndarray, offsets: np.ndarray, deg: np.ndarray, flip: np.ndarray
+) -> np.ndarray:
+    """
+    evolve arcs state wave of one step: apply grover coin on arcs
+    leaving every site, then flip-flop shift
+    """
+    mean = np.add.reduceat(wave, offsets) / deg
+    return (2.0 * np.repeat(mean, deg) - wave)[flip]
+
+
+def quantum_dtime_steps(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    coin=None,
+    coin_state=None,
+    state=None,
+):
+    """
+    yield pdf of quantum random walker discrete-time on-graph at each step
+    (see quantum_dtime_evolve), keeping in memory only the current state,
+    a yielded pdf is overwritten by the next step, return the final state
+    """
+    if not (graph == "line" or graph == "ring"):
+        return (
+            yield from _quantum_dtime_arcs_steps(
+                graph, init_site, limit, nsteps, coin, coin_state, state
+            )
+        )
+    nsites, _ = _graph_sites(graph, limit)
+    coin = _coin_matrix("hadamard" if coin is None else coin)
+    if coin_state is None:
+        coin_state = np.array([1.0, -1.0j]) / np.sqrt(2)
+    coin_state = np.asarray(coin_state, dtype=complex)
+    if not coin_state.shape == (2,) or not np.isclose(la.norm(coin_state), 1.0):
+        _die("[ERROR] initial coin state must be a normalized 2 components vector")
+    # init spinor
+    if state is None:
+        wave = np.zeros((2, nsites), dtype=complex)
+        init_idx = init_site + limit if graph == "line" else init_site
+        wave[:, init_idx] = coin_state
     else:
-        init_idx = init_site
-    pdf[0][init_idx] = 1.0
+        wave = np.array(state, dtype=complex).reshape(2, nsites)
+    swap = np.empty_like(wave)
     # evolve pdf
-    for i, time in enumerate(times[1:]):
-        pdf[i + 1] = la.expm(-time * H) @ pdf[0]
-    # compute std
-    if graph == "ring":
-        sites = np.concatenate(
-            (np.arange(0, int(limit * 0.5) + 1, 1), np.arange(-int(limit * 0.5), 0, 1))
+    pdf = np.sum(wave.real**2 + wave.imag**2, axis=0)
+    yield pdf
+    for _ in range(nsteps):
+        _quantum_dtime_step(graph, wave, coin, swap)
+        wave, swap = swap, wave
+        np.sum(wave.real**2 + wave.imag**2, axis=0, out=pdf)
+        yield pdf
+    return wave
+
+
+def quantum_dtime_evolve(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    coin=None,
+    coin_state=None,
+    state=None,
+    return_state=False,
+) -> np.ndarray:
+    """
+    evolve quantum random walker discrete-time on-graph, keeping in memory
+    only the current state, and return pdf with shape (nsteps+1, nsites)
+        coin - coin name (hadamard, grover) or a 2x2 unitary matrix,
+               default hadamard
+        coin_state - initial coin state, default (1, -i)/sqrt(2)
+        state - initial state overriding init_site and coin_state
+        return_state - also return the final state, as (pdf, state)
+    line and ring graphs are evolved as spinor states, other graphs
+    as grover coined walk on arcs with flip-flop shift, where the
+    initial coin state is by default uniform on arcs leaving init_site
+    """
+    steps = quantum_dtime_steps(
+        graph, init_site, limit, nsteps, coin, coin_state, state
+    )
+    pdf, state = _collect(steps, nsteps + 1)
+    return (pdf, state) if return_state else pdf
+
+
+def _quantum_dtime_arcs_steps(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    coin,
+    coin_state,
+    state=None,
+):
+    """yield pdf of grover coined quantum random walker on arcs of sparse graph"""
+    if not (coin is None or (isinstance(coin, str) and coin == "grover")):
+        _die(f"[ERROR] only grover coin is planned on {graph} graph")
+    nsites, _ = _graph_sites(graph, limit)
+    offsets, deg, flip = _grover_arcs(_gen_adjacency_matrix(graph, nsites))
+    # init arcs state
+    if coin_state is None:
+        coin_state = np.ones(deg[init_site]) / np.sqrt(deg[init_site])
+    coin_state = np.asarray(coin_state, dtype=complex)
+    if not coin_state.shape == (deg[init_site],) or not np.isclose(
+        la.norm(coin_state), 1.0
+    ):
+        _die(
+            "[ERROR] initial coin state must be a normalized vector "
+            f"with {deg[init_site]} components"
         )
-    # save tables
-    if not graph == "rand":
-        var = pdf @ sites**2
-        std = np.sqrt(var)
-        std_df = pd.DataFrame(std.T)
-    pdf_df = pd.DataFrame(pdf)
-    if not graph == "rand":
-        _dump_to_sql([pdf_df, std_df], [f"crw_{graph}_ct_pdf", f"crw_{graph}_ct_std"])
+    if state is None:
+        wave = np.zeros(flip.size, dtype=complex)
+        wave[offsets[init_site] : offsets[init_site] + deg[init_site]] = coin_state
     else:
-        _dump_to_sql([pdf_df], [f"crw_{graph}_ct_pdf"])
+        wave = np.array(state, dtype=complex)
+    # evolve pdf
+    yield np.add.reduceat(wave.real**2 + wave.imag**2, offsets)
+    for _ in range(nsteps):
+        wave = _grover_arcs_step(wave, offsets, deg, flip)
+        yield np.add.reduceat(wave.real**2 + wave.imag**2, offsets)
+    return wave
 
 
-def quantum_dtime(graph: str, init_site: int, limit: int, nsteps: int):
+@_profiled
+def quantum_dtime(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    coin=None,
+    coin_state=None,
+    tag="",
+):
     """
-    save two tables inside sqlite3 db:
+    save tables with the storage backend:
         1. qrw_pdf - row: nsteps+1, col: limit*2+1
         2. qrw_std - row: nsteps+1, col: 1
+        3. qrw_state - row: 1, final state checkpoint to extend the run
     containg the results of:
         quantum random walker discrete-time on-graph simulation
-    save the graph rappresentation as cytoscape compressed json
+    save the graph rappresentation as cytoscape compressed json,
+    tag is appended to tables and json names, return the pdf
+    (cached by parameters)
     """
     # parameters
-    if graph == "line":
-        nsites = limit * 2 + 1
-        sites = np.arange(-limit, limit + 1, 1)
-    elif graph == "ring":
-        nsites = limit + 1
-        sites = np.arange(0, limit + 1, 1)
-    else:
-        _die(f"[ERROR] {graph} graph not planned to be implemented")
-    # init pdf
-    pdf = np.zeros((nsteps + 1, nsites))
-    wave_0 = np.zeros((nsteps + 1, nsites), dtype=complex)
-    wave_1 = np.zeros((nsteps + 1, nsites), dtype=complex)
-    if graph == "line":
-        init_idx = init_site + limit
-    else:
-        init_idx = init_site
-    wave_0[0][init_idx] = 1.0 / np.sqrt(2)
-    wave_1[0][init_idx] = -1.0j / np.sqrt(2)
-    pdf[0][init_idx] = (
-        la.norm(wave_0[0][init_idx]) ** 2 + la.norm(wave_1[0][init_idx]) ** 2
-    )
+    nsites, sites = _graph_sites(graph, limit)
     # evolve pdf
-    if graph == "line":
-        for i in np.arange(1, pdf.shape[0], 1):
-            for j in np.arange(1, pdf.shape[1] - 1, 1):
-                wave_0[i][j] = (wave_0[i - 1][j - 1] + wave_1[i - 1][j - 1]) / np.sqrt(
-                    2
-                )
-                wave_1[i][j] = (wave_0[i - 1][j + 1] - wave_1[i - 1][j + 1]) / np.sqrt(
-                    2
-                )
-                pdf[i][j] = la.norm(wave_0[i][j]) ** 2 + la.norm(wave_1[i][j]) ** 2
-    else:
-        for i in np.arange(1, pdf.shape[0], 1):
-            for j in np.arange(0, pdf.shape[1], 1):
-                if j - 1 == -1:
-                    wave_0[i][j] = (
-                        wave_0[i - 1][limit] + wave_1[i - 1][limit]
-                    ) / np.sqrt(2)
-                    wave_1[i][j] = (
-                        wave_0[i - 1][j + 1] - wave_1[i - 1][j + 1]
-                    ) / np.sqrt(2)
-                elif j + 1 == limit + 1:
-                    wave_0[i][j] = (
-                        wave_0[i - 1][j - 1] + wave_1[i - 1][j - 1]
-                    ) / np.sqrt(2)
-                    wave_1[i][j] = (wave_0[i - 1][0] - wave_1[i - 1][0]) / np.sqrt(2)
-                else:
-                    wave_0[i][j] = (
-                        wave_0[i - 1][j - 1] + wave_1[i - 1][j - 1]
-                    ) / np.sqrt(2)
-                    wave_1[i][j] = (
-                        wave_0[i - 1][j + 1] - wave_1[i - 1][j + 1]
-                    ) / np.sqrt(2)
-                pdf[i][j] = la.norm(wave_0[i][j]) ** 2 + la.norm(wave_1[i][j]) ** 2
+    pdf, state = _cached_state(
+        lambda: quantum_dtime_evolve(
+            graph, init_site, limit, nsteps, coin, coin_state, return_state=True
+        ),
+        "quantum_dtime",
+        graph,
+        init_site,
+        limit,
+        nsteps,
+        coin,
+        coin_state,
+    )
     # draw graph
-    _gen_laplacian_matrix(graph, nsites, "quantum", "discrete")
-    # compute std
-    if graph == "ring":
-        sites = np.concatenate(
-            (np.arange(0, int(limit * 0.5) + 1, 1), np.arange(-int(limit * 0.5), 0, 1))
-        )
-    var = pdf @ sites**2
-    std = np.sqrt(var)
+    _draw_cached(graph, nsites, "quantum", f"discrete{tag}")
     # save tables
-    pdf_df = pd.DataFrame(pdf)
-    std_df = pd.DataFrame(std.T)
-    _dump_to_sql([pdf_df, std_df], [f"qrw_{graph}_pdf", f"qrw_{graph}_std"])
+    _save_tables(
+        f"qrw_{graph}{tag}",
+        pdf,
+        sites,
+        dict(
+            walker="quantum",
+            time="discrete",
+            graph=graph,
+            tag=tag,
+            init_site=init_site,
+            limit=limit,
+            nsteps=nsteps,
+            coin=coin if coin is None or isinstance(coin, str) else "custom",
+            draw=f"quantum-{graph}-discrete{tag}.json.gz",
+        ),
+        (
+            dict(state=_checkpoint(nsteps, 1.0, state))
+            if coin is None or isinstance(coin, str)
+            else None
+        ),
+    )
+    return pdf
+
+
+def _quantum_ctime_states(
+    graph: str,
+    init_site: int,
+    limit: int,
+    gamma: float,
+    method,
+    times: np.ndarray,
+    mem_budget: int = MEM_BUDGET,
+    state=None,
+):
+    """
+    yield (start, amplitudes) chunks of quantum random walker continuous-time
+    on-graph starting localized on init_site, or from amplitudes state
+    if given, method can be:
+        1. eigh - eigendecomposition of the hermitian laplacian
+        2. krylov - expm_multiply of the sparse laplacian
+        3. None - eigh up to DENSE_LIMIT sites, krylov above
+    """
+    nsites, _ = _graph_sites(graph, limit)
+    method = _ctime_method(method, nsites)
+    if method == "propagator":
+        _die("[ERROR] propagator method not planned for quantum walker")
+    H = gamma * _gen_laplacian_matrix(
+        graph, nsites, "quantum", "continuous", False, sparse=method == "krylov"
+    )
+    if state is None:
+        psi0 = np.zeros(nsites, dtype=complex)
+        psi0[init_site + limit if graph == "line" else init_site] = 1.0
+    else:
+        psi0 = np.asarray(state, dtype=complex)
+    if method == "eigh":
+        eig_vals, eig_vecs = la.eigh(H)
+        yield from _spectral_evolve(eig_vals, eig_vecs, psi0, times, -1.0j, mem_budget)
+    else:
+        yield from _krylov_evolve(H, psi0, times, -1.0j, mem_budget)
+
 
+def quantum_ctime_amplitudes(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.35,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+) -> np.ndarray:
+    """
+    return amplitudes of quantum random walker continuous-time on-graph,
+    with shape (times, nsites)
+    """
+    times = _time_grid(nsteps, times)
+    nsites, _ = _graph_sites(graph, limit)
+    amps = np.empty((times.size, nsites), dtype=complex)
+    for start, chunk in _quantum_ctime_states(
+        graph, init_site, limit, gamma, method, times, mem_budget
+    ):
+        amps[start : start + chunk.shape[0]] = chunk
+    return amps
 
-def quantum_ctime(graph: str, init_site: int, limit: int, nsteps: int):
+
+def quantum_ctime_steps(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.35,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+    state=None,
+):
+    """
+    yield pdf of quantum random walker continuous-time on-graph at each
+    time (see quantum_ctime_evolve), evolved in chunks of times inside
+    mem_budget bytes, return the final amplitudes
+    """
+    times = _time_grid(nsteps, times)
+    for _, amps in _quantum_ctime_states(
+        graph, init_site, limit, gamma, method, times, mem_budget, state
+    ):
+        yield from amps.real**2 + amps.imag**2
+        state = amps[-1]
+    return state
+
+
+def quantum_ctime_evolve(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.35,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+    state=None,
+    return_state=False,
+) -> np.ndarray:
     """
-    save two tables inside sqlite3 db:
+    evolve quantum random walker continuous-time on-graph, from
+    init_site or from amplitudes state if given, return pdf with
+    shape (times, nsites), or (pdf, final amplitudes) if return_state
+    """
+    steps = quantum_ctime_steps(
+        graph, init_site, limit, nsteps, gamma, method, times, mem_budget, state
+    )
+    pdf, state = _collect(steps, _time_grid(nsteps, times).size)
+    return (pdf, state) if return_state else pdf
+
+
+@_profiled
+def quantum_ctime(
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma: float = 0.35,
+    method=None,
+    times=None,
+    mem_budget: int = MEM_BUDGET,
+    tag="",
+):
+    """
+    save tables with the storage backend:
         1. qrw_pdf - row: nsteps+1, col: limit*2+1
         2. qrw_std - row: nsteps+1, col: 1
+        3. qrw_state - row: 1, final state checkpoint to extend the run
     containg the results of:
         quantum random walker continuous-time on-graph simulation
-    save the graph rappresentation as cytoscape compressed json
+    save the graph rappresentation as cytoscape compressed json,
+    tag is appended to tables and json names, return the pdf
+    (cached by parameters)
     """
     # parameters
-    gamma = 0.35
-    times = np.linspace(0, nsteps + 1, nsteps + 1)
-    if graph == "line":
-        nsites = limit * 2 + 1
-        sites = np.arange(-limit, limit + 1, 1)
-    elif graph == "ring" or graph == "rand":
-        nsites = limit + 1
-        sites = np.arange(0, limit + 1, 1)
-    else:
-        _die(f"[ERROR] {graph} graph not planned to be implemented")
-    # evolution matrix
-    H = gamma * _gen_laplacian_matrix(graph, nsites, "quantum", "continuous")
-    eig_vals, eig_vecs = la.eigh(H)
-    # init pdf
-    pdf = np.zeros((times.size, nsites))
-    if graph == "line":
-        init_idx = init_site + limit
-    else:
-        init_idx = init_site
-    pdf[0][init_idx] = 1.0
+    nsites, sites = _graph_sites(graph, limit)
     # evolve pdf
-    aj = np.empty(eig_vals.size, dtype=complex)
-    for i, time in enumerate(times[1:]):
-        for j in np.arange(0, pdf.shape[1], 1):
-            for k, (eig_val, eig_vec) in enumerate(zip(eig_vals, eig_vecs)):
-                aj[k] = (
-                    np.exp(-1.0j * eig_val * time, dtype=complex)
-                    * np.conj(eig_vec[init_idx])
-                    * eig_vec[j]
-                )
-            pdf[i + 1][j] = la.norm(np.sum(aj)) ** 2
-    # compute std
-    if graph == "ring":
-        sites = np.concatenate(
-            (np.arange(0, int(limit * 0.5) + 1, 1), np.arange(-int(limit * 0.5), 0, 1))
-        )
+    pdf, state = _cached_state(
+        lambda: quantum_ctime_evolve(
+            graph,
+            init_site,
+            limit,
+            nsteps,
+            gamma,
+            method,
+            times,
+            mem_budget,
+            return_state=True,
+        ),
+        "quantum_ctime",
+        graph,
+        init_site,
+        limit,
+        nsteps,
+        gamma,
+        method,
+        times,
+    )
+    # draw graph
+    _draw_cached(graph, nsites, "quantum", f"continuous{tag}")
     # save tables
-    if not graph == "rand":
-        var = pdf @ sites**2
-        std = np.sqrt(var)
-        std_df = pd.DataFrame(std.T)
-    pdf_df = pd.DataFrame(pdf)
-    if not graph == "rand":
-        _dump_to_sql([pdf_df, std_df], [f"qrw_{graph}_ct_pdf", f"qrw_{graph}_ct_std"])
+    _save_tables(
+        f"qrw_{graph}_ct{tag}",
+        pdf,
+        sites,
+        dict(
+            walker="quantum",
+            time="continuous",
+            graph=graph,
+            tag=tag,
+            init_site=init_site,
+            limit=limit,
+            nsteps=nsteps,
+            gamma=gamma,
+            method=method,
+            draw=f"quantum-{graph}-continuous{tag}.json.gz",
+        ),
+        (
+            dict(state=_checkpoint(nsteps, _time_step(nsteps), state))
+            if times is None
+            else None
+        ),
+    )
+    return pdf
+
+
+def simulate(
+    walker: str,
+    time: str,
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma=None,
+) -> dict:
+    """
+    run a simulation without saving tables nor graph drawing,
+    return a dict with pdf and std (None if not defined)
+    """
+    if (walker, time) not in ENGINES:
+        _die(f"[ERROR] {walker} walker {time} time not planned to be implemented")
+    nsites, sites = _graph_sites(graph, limit)
+    gamma = GAMMAS[walker] if gamma is None else gamma
+    if walker == "classic" and time == "discrete":
+        pdf = classic_dtime_evolve(graph, init_site, limit, nsteps)
+    elif walker == "classic":
+        pdf = classic_ctime_evolve(graph, init_site, limit, nsteps, gamma)
+    elif time == "discrete":
+        pdf = quantum_dtime_evolve(graph, init_site, limit, nsteps)
     else:
-        _dump_to_sql([pdf_df], [f"qrw_{graph}_ct_pdf"])
+        pdf = quantum_ctime_evolve(graph, init_site, limit, nsteps, gamma)
+    std = np.sqrt(pdf @ sites**2) if sites is not None else None
+    return dict(pdf=pdf, std=std)
 
 
-if __name__ == "__main__":
+class TableSink:
+    """
+    stream sink appending pdf rows, and std rows if sites are given,
+    to name tables in batches, so at most batch rows are in memory
+    """
+
+    def __init__(self, name: str, sites=None, batch: int = SINK_BATCH, storage=None):
+        self.name = name
+        self.sites = sites
+        self.batch = batch
+        self.storage = storage
+        self.nrows = 0
+        self._rows = list()
+
+    def write(self, step: int, pdf: np.ndarray):
+        self._rows.append(np.array(pdf))
+        if len(self._rows) >= self.batch:
+            self._flush()
+
+    def _flush(self):
+        """append buffered rows, the first batch creates the tables"""
+        if not self._rows:
+            return
+        pdf = np.stack(self._rows)
+        arrays, tables = [pdf], [f"{self.name}_pdf"]
+        if self.sites is not None:
+            arrays.append(np.sqrt(pdf @ self.sites**2))
+            tables.append(f"{self.name}_std")
+        if self.nrows:
+            storage.append(arrays, tables, self.nrows, storage=self.storage)
+        else:
+            storage.dump(arrays, tables, storage=self.storage)
+        self.nrows += pdf.shape[0]
+        self._rows = list()
+
+    def close(self):
+        self._flush()
+
+
+class DecimateSink:
+    """stream sink forwarding only every k-th step to sink"""
+
+    def __init__(self, sink, every: int):
+        self.sink = sink
+        self.every = every
+
+    def write(self, step: int, pdf: np.ndarray):
+        if not step % self.every:
+            self.sink.write(step, pdf)
+
+    def close(self):
+        self.sink.close()
+
+
+class StatsSink:
+    """
+    stream sink keeping only statistics of each step: total and max
+    probability, plus mean and std position if sites are given
+    """
+
+    def __init__(self, sites=None):
+        self.sites = sites
+        self.stats = dict(norm=list(), max=list())
+        if sites is not None:
+            self.stats.update(mean=list(), std=list())
+
+    def write(self, step: int, pdf: np.ndarray):
+        self.stats["norm"].append(pdf.sum())
+        self.stats["max"].append(pdf.max())
+        if self.sites is not None:
+            self.stats["mean"].append(pdf @ self.sites)
+            self.stats["std"].append(np.sqrt(pdf @ self.sites**2))
+
+    def close(self):
+        self.stats = {key: np.array(values) for key, values in self.stats.items()}
+
+
+class ObservablesSink:
+    """
+    stream sink computing, on batches of steps, observables of each step:
+        1. std - sqrt of second moment of sites coordinates
+        2. return - return probability to init site index
+        3. ipr - inverse participation ratio, sum of squared pdf
+        4. entropy - shannon entropy of pdf
+        5. tvd - total variation distance to stationary distribution
+    """
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        init_idx: int,
+        stationary: np.ndarray,
+        batch: int = SINK_BATCH,
+    ):
+        self.coords = coords
+        self.init_idx = init_idx
+        self.stationary = stationary
+        self.batch = batch
+        self.observables = {name: list() for name in OBSERVABLES}
+        self._rows = list()
+
+    def write(self, step: int, pdf: np.ndarray):
+        self._rows.append(np.array(pdf))
+        if len(self._rows) >= self.batch:
+            self._flush()
+
+    def _flush(self):
+        """compute observables of buffered rows"""
+        if not self._rows:
+            return
+        pdf = np.stack(self._rows)
+        logp = np.log(pdf, out=np.zeros_like(pdf), where=pdf > 0)
+        batch = dict(
+            std=np.sqrt(pdf @ self.coords**2),
+            ipr=np.sum(pdf**2, axis=1),
+            entropy=-np.sum(pdf * logp, axis=1),
+            tvd=0.5 * np.sum(np.abs(pdf - self.stationary), axis=1),
+        )
+        batch["return"] = pdf[:, self.init_idx]
+        for name, values in batch.items():
+            self.observables[name].append(values)
+        self._rows = list()
+
+    def close(self):
+        self._flush()
+        self.observables = {
+            name: np.concatenate(values) if values else np.empty(0)
+            for name, values in self.observables.items()
+        }
+
+
+def _coordinates(graph: str, init_site: int, limit: int) -> np.ndarray:
+    """
+    return sites coordinates std is computed from: line and ring sites
+    coordinates (see _graph_sites), for other graphs shortest path
+    distance from init_site, 0 for unreachable sites never visited
+    """
+    nsites, sites = _graph_sites(graph, limit)
+    if sites is not None:
+        return sites
+    A = _gen_adjacency_matrix(graph, nsites)
+    dist = csgraph.shortest_path(A, unweighted=True, indices=init_site)
+    dist[np.isinf(dist)] = 0.0
+    return dist
+
+
+def _stationary(walker: str, time: str, graph: str, nsites: int) -> np.ndarray:
+    """
+    return stationary distribution tvd is computed to: degree
+    proportional for classic discrete-time walker (transition matrix
+    A D^-1), uniform otherwise (laplacian evolution, quantum walkers)
+    """
+    if walker == "classic" and time == "discrete":
+        deg = _gen_adjacency_matrix(graph, nsites).sum(axis=0)
+        return deg / deg.sum()
+    return np.full(nsites, 1.0 / nsites)
+
+
+def stream(
+    walker: str,
+    time: str,
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    sinks: list,
+    gamma=None,
+    mem_budget: int = MEM_BUDGET,
+):
+    """
+    run a simulation feeding the pdf of each step to sinks, objects
+    with write(step, pdf) and close() methods, without keeping the
+    whole pdf in memory: discrete-time walkers keep only the current
+    step, continuous-time ones chunks of times inside mem_budget bytes,
+    return the final state (see extend)
+    """
+    if (walker, time) not in ENGINES:
+        _die(f"[ERROR] {walker} walker {time} time not planned to be implemented")
+    gamma = GAMMAS[walker] if gamma is None else gamma
+    if walker == "classic" and time == "discrete":
+        steps = classic_dtime_steps(graph, init_site, limit, nsteps)
+    elif walker == "classic":
+        steps = classic_ctime_steps(
+            graph, init_site, limit, nsteps, gamma, mem_budget=mem_budget
+        )
+    elif time == "discrete":
+        steps = quantum_dtime_steps(graph, init_site, limit, nsteps)
+    else:
+        steps = quantum_ctime_steps(
+            graph, init_site, limit, nsteps, gamma, mem_budget=mem_budget
+        )
+    step = 0
+    while True:
+        try:
+            pdf = next(steps)
+        except StopIteration as stop:
+            state = stop.value
+            break
+        for sink in sinks:
+            sink.write(step, pdf)
+        step += 1
+    for sink in sinks:
+        sink.close()
+    return state
+
+
+def stream_tables(
+    walker: str,
+    time: str,
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma=None,
+    every: int = 1,
+    batch: int = SINK_BATCH,
+):
+    """
+    run a simulation streaming its pdf and std tables to the storage
+    backend in batches of rows, keeping only every k-th step if every
+    is above 1, then save the graph drawing and the final state
+    checkpoint (not decimated runs only) and record the run in the
+    manifest index, tables are named as sweep ones plus _stream tag
+    """
+    gamma = GAMMAS[walker] if gamma is None else gamma
+    job = dict(
+        walker=walker,
+        time=time,
+        graph=graph,
+        init_site=init_site,
+        limit=limit,
+        nsteps=nsteps,
+        gamma=gamma,
+    )
+    tag = f"_stream{_sweep_tag(job)}" + (f"_e{every}" if every > 1 else "")
+    name = f"{'crw' if walker == 'classic' else 'qrw'}_{graph}"
+    name += f"{'_ct' if time == 'continuous' else ''}{tag}"
+    nsites, sites = _graph_sites(graph, limit)
+    sink = TableSink(name, sites, batch)
+    state = stream(
+        walker,
+        time,
+        graph,
+        init_site,
+        limit,
+        nsteps,
+        [DecimateSink(sink, every) if every > 1 else sink],
+        gamma,
+    )
+    _draw_cached(graph, nsites, walker, f"{time}{tag}")
+    tables = [f"{name}_pdf"] + ([f"{name}_std"] if sites is not None else [])
+    if every == 1:
+        dt = 1.0 if time == "discrete" else _time_step(nsteps)
+        _dump([_checkpoint(nsteps, dt, state)], [f"{name}_state"])
+        tables.append(f"{name}_state")
+    params = dict(job, tag=tag, method=None, coin=None, every=every)
+    if time == "discrete":
+        del params["gamma"]
+    try:
+        storage.register(
+            name,
+            storage.load(f"{name}_pdf"),
+            tables,
+            params,
+            draw=f"{walker}-{graph}-{time}{tag}.json.gz",
+        )
+    except ValueError as e:
+        _die(f"[ERROR] {e}")
+    return name
+
+
+def observables_tables(
+    walker: str,
+    time: str,
+    graph: str,
+    init_site: int,
+    limit: int,
+    nsteps: int,
+    gamma=None,
+    batch: int = SINK_BATCH,
+) -> dict:
+    """
+    run a simulation in observables-only mode, streaming steps to an
+    observables sink instead of storing the pdf, save one table of
+    nsteps+1 rows per observable (see ObservablesSink), named as sweep
+    tables plus _obs tag, and return the observables, std is defined on
+    every graph: on line and ring from sites coordinates as std tables,
+    on others from shortest path distance to init_site
+    """
+    gamma = GAMMAS[walker] if gamma is None else gamma
+    job = dict(
+        walker=walker,
+        time=time,
+        graph=graph,
+        init_site=init_site,
+        limit=limit,
+        nsteps=nsteps,
+        gamma=gamma,
+    )
+    name = f"{'crw' if walker == 'classic' else 'qrw'}_{graph}"
+    name += f"{'_ct' if time == 'continuous' else ''}_obs{_sweep_tag(job)}"
+    nsites, _ = _graph_sites(graph, limit)
+    sink = ObservablesSink(
+        _coordinates(graph, init_site, limit),
+        init_site + limit if graph == "line" else init_site,
+        _stationary(walker, time, graph, nsites),
+        batch,
+    )
+    stream(walker, time, graph, init_site, limit, nsteps, [sink], gamma)
+    _dump(
+        list(sink.observables.values()),
+        [f"{name}_{observable}" for observable in sink.observables],
+    )
+    return sink.observables
+
+
+def _extend_evolve(run: dict, state: np.ndarray, nsteps: int, dt: float):
+    """return (pdf, final state) of run evolved nsteps from state"""
+    params, graph = run["params"], run["graph"]
+    if run["walker"] == "classic" and run["time"] == "discrete":
+        pdf = classic_dtime_evolve(graph, state, params["limit"], nsteps)
+        return pdf, pdf[-1]
+    times = dt * np.arange(nsteps + 1)
+    if run["walker"] == "classic":
+        pdf = classic_ctime_evolve(
+            graph,
+            params["init_site"],
+            params["limit"],
+            nsteps,
+            params["gamma"],
+            params["method"],
+            times,
+            state=state,
+        )
+        return pdf, pdf[-1]
+    if run["time"] == "discrete":
+        return quantum_dtime_evolve(
+            graph,
+            params["init_site"],
+            params["limit"],
+            nsteps,
+            params["coin"],
+            state=state,
+            return_state=True,
+        )
+    return quantum_ctime_evolve(
+        graph,
+        params["init_site"],
+        params["limit"],
+        nsteps,
+        params["gamma"],
+        params["method"],
+        times,
+        state=state,
+        return_state=True,
+    )
+
+
+def extend(name: str, nsteps: int, chunk: int = EXTEND_CHUNK):
+    """
+    extend run name up to nsteps steps continuing from its final state
+    checkpoint, so only the added steps are evolved and their rows are
+    appended to pdf and std tables, chunk steps at a time each followed
+    by its checkpoint, so an interrupted extension resumes from the last
+    finished chunk when run again
+    """
+    found = storage.runs(name=name)
+    if not found:
+        _die(f"[ERROR] {name} run not found in manifest index")
+    run = found[0]
+    if f"{name}_state" not in run["tables"]:
+        _die(f"[ERROR] {name} run has no checkpoint to extend")
+    nsites, sites = _graph_sites(run["graph"], run["params"]["limit"])
+    step, dt, state = _restore(
+        storage.load(f"{name}_state", storage=run["storage"]), run["walker"]
+    )
+    if nsteps < step:
+        _die(f"[ERROR] {name} run has already {step} steps")
+    print(f"[INFO] extend {name} from {step} to {nsteps} steps")
+    try:
+        while step < nsteps:
+            added = min(chunk, nsteps - step)
+            pdf, state = _extend_evolve(run, state, added, dt)
+            arrays, tables = [pdf[1:]], [f"{name}_pdf"]
+            if sites is not None:
+                arrays.append(np.sqrt(pdf[1:] @ sites**2))
+                tables.append(f"{name}_std")
+            storage.append(arrays, tables, step + 1, storage=run["storage"])
+            step += added
+            storage.dump(
+                [_checkpoint(step, dt, state)],
+                [f"{name}_state"],
+                storage=run["storage"],
+            )
+        run["params"]["nsteps"] = step
+        storage.register(
+            name,
+            storage.load(f"{name}_pdf", storage=run["storage"]),
+            run["tables"],
+            run["params"],
+            draw=run["draw"],
+            storage=run["storage"],
+        )
+    except ValueError as e:
+        _die(f"[ERROR] {e}")
+
+
+def _sweep_tag(job: dict) -> str:
+    """return table name tag derived from sweep job parameters"""
+    tag = f"_i{job['init_site']}_l{job['limit']}_n{job['nsteps']}"
+    if job["time"] == "continuous":
+        tag += f"_g{job['gamma']:g}"
+    return tag.replace("-", "m").replace(".", "p")
+
+
+def _sweep_job(job: dict) -> dict:
+    """run a sweep job saving its results with parameters derived names"""
+    if job.get("observables"):
+        observables_tables(
+            job["walker"],
+            job["time"],
+            job["graph"],
+            job["init_site"],
+            job["limit"],
+            job["nsteps"],
+            job["gamma"],
+        )
+        return job
+    engine = ENGINES[(job["walker"], job["time"])]
+    kwargs = dict(gamma=job["gamma"]) if job["time"] == "continuous" else dict()
+    engine(
+        job["graph"],
+        job["init_site"],
+        job["limit"],
+        job["nsteps"],
+        tag=_sweep_tag(job),
+        **kwargs,
+    )
+    return job
+
+
+def sweep(
+    walkers: list,
+    times: list,
+    graphs: list,
+    init_sites: list,
+    limits: list,
+    nsteps: list,
+    gammas=None,
+    jobs=None,
+    journal: str = SWEEP_JOURNAL,
+    observables=False,
+):
+    """
+    run the grid of simulations walkers x times x graphs x init_sites x
+    limits x nsteps x gammas over a pool of jobs processes, gammas apply
+    only to continuous-time walkers (default: walker gamma), every finished
+    job is appended to the journal so an interrupted sweep resumes
+    without redoing finished jobs, with observables jobs save only
+    observables tables (see observables_tables)
+    """
+    grid = list()
+    for walker, time, graph, init_site, limit, steps in product(
+        walkers, times, graphs, init_sites, limits, nsteps
+    ):
+        if time == "discrete":
+            walker_gammas = [None]
+        else:
+            walker_gammas = gammas if gammas else [GAMMAS[walker]]
+        for gamma in walker_gammas:
+            job = dict(
+                walker=walker,
+                time=time,
+                graph=graph,
+                init_site=init_site,
+                limit=limit,
+                nsteps=steps,
+                gamma=gamma,
+            )
+            if observables:
+                job["observables"] = True
+            if job not in grid:
+                grid.append(job)
+    # skip finished jobs
+    done = list()
+    if os.path.exists(journal):
+        with open(journal, "r", encoding="UTF-8") as jf:
+            done = [json.loads(line) for line in jf if line.strip()]
+    todo = [job for job in grid if job not in done]
+    print(f"[INFO] sweep {len(todo)} jobs, {len(grid) - len(todo)} already done")
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_sweep_job, job): job for job in todo}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+            except BaseException as e:
+                failed += 1
+                print(f"[ERROR] sweep job {job} failed: {e!r}", file=sys.stderr)
+                continue
+            with open(journal, "a", encoding="UTF-8") as jf:
+                jf.write(json.dumps(job) + "\n")
+    if failed:
+        _die(f"[ERROR] {failed} sweep jobs failed")
+
+
+# walkers engines and default gammas
+ENGINES = {
+    ("classic", "discrete"): classic_dtime,
+    ("classic", "continuous"): classic_ctime,
+    ("quantum", "discrete"): quantum_dtime,
+    ("quantum", "continuous"): quantum_ctime,
+}
+GAMMAS = {"classic": 0.15, "quantum": 0.35}
+
+
+def _defaults():
+    """run default simulations shown by the dash app"""
     classic_dtime("line", 0, 50, 100)
     classic_dtime("ring", 0, 100, 100)
 
@@ -355,3 +1989,158 @@ if __name__ == "__main__":
     quantum_ctime("line", 0, 80, 100)
     quantum_ctime("ring", 0, 200, 100)
     quantum_ctime("rand", 0, 100, 100)
+
+
+def _parse_args(argv: list):
+    """parse command line arguments"""
+    parser = ArgumentParser(description="random walk simulations")
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=PROFILE_DIR,
+        help="write engines runs profiling reports to DIR",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        default=PROFILE_CPROFILE,
+        help="with --profile also dump cprofile stats",
+    )
+    commands = parser.add_subparsers(dest="command")
+    sweep_parser = commands.add_parser("sweep", help="run a parameters sweep")
+    sweep_parser.add_argument(
+        "--walker", nargs="+", default=["classic", "quantum"], choices=GAMMAS
+    )
+    sweep_parser.add_argument(
+        "--time",
+        nargs="+",
+        default=["discrete", "continuous"],
+        choices=["discrete", "continuous"],
+    )
+    sweep_parser.add_argument("--graph", nargs="+", default=["line", "ring"])
+    sweep_parser.add_argument("--init-site", nargs="+", type=int, default=[0])
+    sweep_parser.add_argument("--limit", nargs="+", type=int, required=True)
+    sweep_parser.add_argument("--nsteps", nargs="+", type=int, required=True)
+    sweep_parser.add_argument("--gamma", nargs="+", type=float)
+    sweep_parser.add_argument(
+        "--jobs", type=int, help="number of processes (default: cpu count)"
+    )
+    sweep_parser.add_argument("--journal", default=SWEEP_JOURNAL)
+    sweep_parser.add_argument(
+        "--observables", action="store_true", help="save only observables tables"
+    )
+    mc_parser = commands.add_parser("mc", help="run a classic monte carlo ensemble")
+    mc_parser.add_argument("graph")
+    mc_parser.add_argument("time", choices=["discrete", "continuous"])
+    mc_parser.add_argument("--init-site", type=int, default=0)
+    mc_parser.add_argument("--limit", type=int, required=True)
+    mc_parser.add_argument("--nsteps", type=int, required=True)
+    mc_parser.add_argument("--nwalkers", type=int, default=10**6)
+    mc_parser.add_argument("--seed", type=int, default=0)
+    mc_parser.add_argument("--gamma", type=float, default=GAMMAS["classic"])
+    mc_parser.add_argument("--target", type=int, help="first passage target site")
+    mc_parser.add_argument(
+        "--jobs", type=int, help="number of processes (default: cpu count)"
+    )
+    stream_parser = commands.add_parser(
+        "stream", help="run a simulation streaming steps to storage"
+    )
+    stream_parser.add_argument("walker", choices=GAMMAS)
+    stream_parser.add_argument("time", choices=["discrete", "continuous"])
+    stream_parser.add_argument("graph")
+    stream_parser.add_argument("--init-site", type=int, default=0)
+    stream_parser.add_argument("--limit", type=int, required=True)
+    stream_parser.add_argument("--nsteps", type=int, required=True)
+    stream_parser.add_argument("--gamma", type=float)
+    stream_parser.add_argument(
+        "--every", type=int, default=1, help="keep only every k-th step"
+    )
+    stream_parser.add_argument(
+        "--batch", type=int, default=SINK_BATCH, help="rows appended at once"
+    )
+    observables_parser = commands.add_parser(
+        "observables", help="run a simulation saving only its observables"
+    )
+    observables_parser.add_argument("walker", choices=GAMMAS)
+    observables_parser.add_argument("time", choices=["discrete", "continuous"])
+    observables_parser.add_argument("graph")
+    observables_parser.add_argument("--init-site", type=int, default=0)
+    observables_parser.add_argument("--limit", type=int, required=True)
+    observables_parser.add_argument("--nsteps", type=int, required=True)
+    observables_parser.add_argument("--gamma", type=float)
+    extend_parser = commands.add_parser(
+        "extend", help="extend a run from its checkpoint"
+    )
+    extend_parser.add_argument("name")
+    extend_parser.add_argument(
+        "--nsteps", type=int, required=True, help="total number of steps"
+    )
+    extend_parser.add_argument(
+        "--chunk", type=int, default=EXTEND_CHUNK, help="steps between checkpoints"
+    )
+    cache_parser = commands.add_parser("cache", help="inspect or purge results cache")
+    cache_parser.add_argument("action", choices=["inspect", "purge"])
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    # profiling settings, through env also for jobs processes
+    PROFILE_DIR, PROFILE_CPROFILE = args.profile, args.cprofile
+    if PROFILE_DIR:
+        os.environ["RWALKER_PROFILE"] = PROFILE_DIR
+        os.environ["RWALKER_PROFILE_CPROFILE"] = "1" if PROFILE_CPROFILE else ""
+    if args.command == "sweep":
+        sweep(
+            args.walker,
+            args.time,
+            args.graph,
+            args.init_site,
+            args.limit,
+            args.nsteps,
+            args.gamma,
+            args.jobs,
+            args.journal,
+            args.observables,
+        )
+    elif args.command == "mc":
+        classic_mc(
+            args.graph,
+            args.time,
+            args.init_site,
+            args.limit,
+            args.nsteps,
+            args.nwalkers,
+            args.seed,
+            args.gamma,
+            args.target,
+            nprocs=args.jobs,
+        )
+    elif args.command == "stream":
+        stream_tables(
+            args.walker,
+            args.time,
+            args.graph,
+            args.init_site,
+            args.limit,
+            args.nsteps,
+            args.gamma,
+            args.every,
+            args.batch,
+        )
+    elif args.command == "observables":
+        observables_tables(
+            args.walker,
+            args.time,
+            args.graph,
+            args.init_site,
+            args.limit,
+            args.nsteps,
+            args.gamma,
+        )
+    elif args.command == "extend":
+        extend(args.name, args.nsteps, args.chunk)
+    elif args.command == "cache":
+        cache_inspect() if args.action == "inspect" else cache_purge()
+    else:
+        _defaults()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# data dirs
+if os.path.exists("/data"):
+    DATA_DIR = "/data"
+else:
+    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SQLITE3_DB = os.path.join(DATA_DIR, "rwalker.sqlite3")
+ARRAYS_DIR = os.path.join(DATA_DIR, "arrays")
+INDEX_DB = os.path.join(DATA_DIR, "index.sqlite3")
+
+# manifest index columns, json ones are decoded by runs
+INDEX_COLUMNS = (
+    "name",
+    "walker",
+    "time",
+    "graph",
+    "tag",
+    "nsites",
+    "nsteps",
+    "tables",
+    "shape",
+    "dtype",
+    "storage",
+    "location",
+    "draw",
+    "checksum",
+    "params",
+)
+INDEX_JSON = ("tables", "shape", "params")
+
+# storage backend: npy (array files + json manifest) or sqlite
+STORAGE = os.environ.get("RWALKER_STORAGE", "npy")
+
+# seconds to wait for sqlite3 db lock held by concurrent writers
+SQLITE3_TIMEOUT = 600
+
+
+def _backend(storage) -> str:
+    """return storage backend, by default the configured one"""
+    storage = STORAGE if storage is None else storage
+    if storage not in ("npy", "sqlite"):
+        raise ValueError(f"{storage} storage not planned to be implemented")
+    return storage
+
+
+def _atomic_write(path: str, write):
+    """write a file with write(file) through a temporary file"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def manifest(table: str) -> dict:
+    """return npy table manifest: table, file, shape and dtype"""
+    with open(os.path.join(ARRAYS_DIR, f"{table}.json"), "r", encoding="UTF-8") as f:
+        return json.load(f)
+
+
+def dump(arrays: list, tables: list, storage=None):
+    """
+    save input arrays as tables:
+        1. npy - one array file per table written in bulk,
+           plus a json manifest with its shape and dtype
+        2. sqlite - one sqlite3 table per array, one column per site
+    """
+    if _backend(storage) == "sqlite":
+        engine = sqlite3.connect(SQLITE3_DB, timeout=SQLITE3_TIMEOUT)
+        for arr, table in zip(arrays, tables):
+            pd.DataFrame(arr).to_sql(table, engine, if_exists="replace", index=False)
+        engine.close()
+        return
+    os.makedirs(ARRAYS_DIR, exist_ok=True)
+    for arr, table in zip(arrays, tables):
+        arr = np.ascontiguousarray(arr)
+        meta = dict(
+            table=table, file=f"{table}.npy", shape=arr.shape, dtype=arr.dtype.str
+        )
+        _atomic_write(os.path.join(ARRAYS_DIR, meta["file"]), lambda f: np.save(f, arr))
+        _atomic_write(
+            os.path.join(ARRAYS_DIR, f"{table}.json"),
+            lambda f: f.write(json.dumps(meta).encode()),
+        )
+
+
+def append(arrays: list, tables: list, start: int, storage=None):
+    """
+    write input arrays rows into existing tables from row start on,
+    dropping rows after them (left by an interrupted append):
+        1. npy - rows are written in place after the first start rows,
+           and the header and json manifest get the new shape
+        2. sqlite - rows after the first start are deleted, then
+           the new ones are inserted
+    """
+    if _backend(storage) == "sqlite":
+        engine = sqlite3.connect(SQLITE3_DB, timeout=SQLITE3_TIMEOUT)
+        for arr, table in zip(arrays, tables):
+            with engine:
+                engine.execute(f"delete from {table} where rowid > ?", (start,))
+            pd.DataFrame(arr).to_sql(table, engine, if_exists="append", index=False)
+        engine.close()
+        return
+    for arr, table in zip(arrays, tables):
+        meta = manifest(table)
+        path = os.path.join(ARRAYS_DIR, meta["file"])
+        old = np.load(path, mmap_mode="r")
+        arr = np.ascontiguousarray(arr, dtype=old.dtype)
+        if not arr.shape[1:] == old.shape[1:] or start > old.shape[0]:
+            raise ValueError(f"{table} table has shape {old.shape}, can't append")
+        meta["shape"] = (start + arr.shape[0],) + old.shape[1:]
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header, dict(descr=old.dtype.str, fortran_order=False, shape=meta["shape"])
+        )
+        offset = old.offset
+        del old
+        if not header.tell() == offset:
+            # header grew, rewrite whole table
+            old = np.load(path)
+            dump([np.concatenate((old[:start], arr))], [table], storage="npy")
+            continue
+        with open(path, "r+b") as f:
+            f.write(header.getvalue())
+            f.seek(offset + start * arr[:1].nbytes)
+            f.write(arr.data)
+            f.truncate()
+        _atomic_write(
+            os.path.join(ARRAYS_DIR, f"{table}.json"),
+            lambda f: f.write(json.dumps(meta).encode()),
+        )
+
+
+def load(table: str, storage=None) -> np.ndarray:
+    """
+    return table as array, npy tables are read-only memory mapped
+    (zero-copy), sqlite tables are read in memory
+    """
+    if _backend(storage) == "sqlite":
+        engine = sqlite3.connect(SQLITE3_DB)
+        arr = pd.read_sql(f"select * from {table}", engine).to_numpy()
+        engine.close()
+        return arr
+    return np.load(os.path.join(ARRAYS_DIR, manifest(table)["file"]), mmap_mode="r")
+
+
+def tables(storage=None) -> list:
+    """return names of saved tables"""
+    if _backend(storage) == "sqlite":
+        if not os.path.exists(SQLITE3_DB):
+            return list()
+        engine = sqlite3.connect(SQLITE3_DB)
+        names = [
+            name
+            for (name,) in engine.execute(
+                "select name from sqlite_master where type='table'"
+            )
+        ]
+        engine.close()
+        return names
+    if not os.path.isdir(ARRAYS_DIR):
+        return list()
+    return sorted(
+        name[: -len(".json")]
+        for name in os.listdir(ARRAYS_DIR)
+        if name.endswith(".json")
+    )
+
+
+def _index() -> sqlite3.Connection:
+    """return connection to manifest index, creating it if missing"""
+    engine = sqlite3.connect(INDEX_DB, timeout=SQLITE3_TIMEOUT)
+    engine.execute(
+        "create table if not exists runs ("
+        "name text primary key, walker text, time text, graph text, tag text, "
+        "nsites integer, nsteps integer, tables text, shape text, dtype text, "
+        "storage text, location text, draw text, checksum text, params text)"
+    )
+    engine.execute(
+        "create index if not exists runs_selection "
+        "on runs (walker, time, graph, nsites)"
+    )
+    engine.execute("create index if not exists runs_tag on runs (tag)")
+    return engine
+
+
+def register(
+    name: str, pdf: np.ndarray, tables: list, params: dict, draw=None, storage=None
+):
+    """
+    record a run in the manifest index: selection (walker, time, graph,
+    tag), pdf shape and dtype, saved tables and their storage location,
+    graph draw file, pdf sha256 checksum and all run parameters
+    """
+    storage = _backend(storage)
+    pdf = np.ascontiguousarray(pdf)
+    if storage == "npy":
+        location = os.path.relpath(ARRAYS_DIR, DATA_DIR)
+    else:
+        location = os.path.relpath(SQLITE3_DB, DATA_DIR)
+    row = dict(
+        name=name,
+        walker=params["walker"],
+        time=params["time"],
+        graph=params["graph"],
+        tag=params.get("tag", ""),
+        nsites=pdf.shape[1],
+        nsteps=pdf.shape[0] - 1,
+        tables=tables,
+        shape=pdf.shape,
+        dtype=pdf.dtype.str,
+        storage=storage,
+        location=location,
+        draw=draw,
+        checksum=hashlib.sha256(pdf.data).hexdigest(),
+        params=params,
+    )
+    values = [
+        json.dumps(row[col]) if col in INDEX_JSON else row[col] for col in INDEX_COLUMNS
+    ]
+    engine = _index()
+    with engine:
+        engine.execute(
+            f"insert or replace into runs ({', '.join(INDEX_COLUMNS)}) "
+            f"values ({', '.join('?' * len(INDEX_COLUMNS))})",
+            values,
+        )
+    engine.close()
+
+
+def _where(max_nsites=None, **filters):
+    """return sql where clause and its values of runs filters"""
+    where, values = list(), list()
+    for col, value in filters.items():
+        if col not in ("name", "walker", "time", "graph", "tag"):
+            raise ValueError(f"{col} filter not planned to be implemented")
+        where.append(f"{col} = ?")
+        values.append(value)
+    if max_nsites is not None:
+        where.append("nsites <= ?")
+        values.append(max_nsites)
+    return (f" where {' and '.join(where)}" if where else ""), values
+
+
+def runs(max_nsites=None, **filters) -> list:
+    """
+    return runs of manifest index matching filters (equality on name,
+    walker, time, graph or tag) with at most max_nsites sites, ordered
+    by sites and name
+    """
+    if not os.path.exists(INDEX_DB):
+        return list()
+    where, values = _where(max_nsites, **filters)
+    engine = _index()
+    rows = engine.execute(
+        f"select {', '.join(INDEX_COLUMNS)} from runs{where} order by nsites, name",
+        values,
+    ).fetchall()
+    engine.close()
+    return [
+        {
+            col: json.loads(value) if col in INDEX_JSON else value
+            for col, value in zip(INDEX_COLUMNS, row)
+        }
+        for row in rows
+    ]
+
+
+def distinct(column: str, **filters) -> list:
+    """return sorted distinct values of walker, time or graph column"""
+    if column not in ("walker", "time", "graph"):
+        raise ValueError(f"{column} column not planned to be implemented")
+    if not os.path.exists(INDEX_DB):
+        return list()
+    where, values = _where(**filters)
+    engine = _index()
+    rows = engine.execute(
+        f"select distinct {column} from runs{where} order by {column}", values
+    ).fetchall()
+    engine.close()
+    return [value for (value,) in rows]